@@ -6,13 +6,16 @@ from flask_limiter.util import get_remote_address
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
-import os
-import logging
-from logging.handlers import RotatingFileHandler
 import sentry_sdk
 from sentry_sdk.integrations.flask import FlaskIntegration
 from app.middleware import RequestIDMiddleware, init_request_id, get_request_id
-from app.handlers import register_error_handlers
+from app.handlers import register_error_handlers, report_error_counts
+from app.log import configure_logging
+from app.clients import ClientRegistry
+from app.scheduler import Scheduler
+from app.tasks import TaskQueue
+from app.upstream import UpstreamGuard
+from app.commands import register_commands
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -20,16 +23,39 @@ migrate = Migrate()
 csrf = CSRFProtect()
 limiter = Limiter(key_func=get_remote_address)
 login_manager = LoginManager()
+clients = ClientRegistry()
+scheduler = Scheduler()
+tasks = TaskQueue()
+upstream = UpstreamGuard()
 
 def configure_sentry(app):
     """Configure Sentry error tracking"""
     if app.config['ENV'] == 'production':
+        default_rate = app.config['SENTRY_TRACES_SAMPLE_RATE']
+        # Longest prefixes first so /chat/stream can override /chat
+        route_rates = sorted(
+            app.config['SENTRY_ROUTE_SAMPLE_RATES'].items(),
+            key=lambda item: len(item[0]),
+            reverse=True
+        )
+        
+        def traces_sampler(sampling_context):
+            """Pick the trace rate for a request from its path"""
+            if sampling_context.get('parent_sampled') is not None:
+                return sampling_context['parent_sampled']
+            path = sampling_context.get('wsgi_environ', {}).get('PATH_INFO', '')
+            for prefix, rate in route_rates:
+                if path.startswith(prefix):
+                    return rate
+            return default_rate
+        
         sentry_sdk.init(
             dsn=app.config['SENTRY_DSN'],
             integrations=[FlaskIntegration()],
             environment=app.config['ENV'],
-            traces_sample_rate=1.0,
-            profiles_sample_rate=1.0,
+            traces_sampler=traces_sampler,
+            # Fraction of sampled transactions that are also profiled
+            profiles_sample_rate=app.config['SENTRY_PROFILES_SAMPLE_RATE'],
             
             # Include request ID in all events
             before_send=lambda event, hint: {
@@ -66,6 +92,10 @@ def create_app(config=None):
     csrf.init_app(app)
     limiter.init_app(app)
     login_manager.init_app(app)
+    clients.init_app(app)
+    scheduler.init_app(app)
+    tasks.init_app(app)
+    upstream.init_app(app)
     login_manager.login_view = 'auth.login'
     
     @login_manager.user_loader
@@ -88,23 +118,7 @@ def create_app(config=None):
         })
     
     # Configure logging
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    file_handler = RotatingFileHandler(
-        'logs/jane.log', 
-        maxBytes=10240, 
-        backupCount=10
-    )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
-    
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
+    configure_logging(app)
     
     # Register blueprints
     from app.routes.main import main as main_blueprint
@@ -128,4 +142,17 @@ def create_app(config=None):
     # Register error handlers
     register_error_handlers(app)
     
+    # Register CLI commands and periodic maintenance jobs
+    register_commands(app)
+    
+    from app.services.cache_service import CacheService
+    from app.services.message_service import MessageService
+    from app.services.sms_service import SMSService
+    scheduler.add_job(app, 'cache-sweep', app.config['CACHE_SWEEP_INTERVAL'], CacheService.sweep)
+    scheduler.add_job(app, 'cache-stats', app.config['CACHE_STATS_INTERVAL'], CacheService.publish_stats)
+    scheduler.add_job(app, 'sms-delivery-purge', app.config['SMS_DELIVERY_PURGE_INTERVAL'], SMSService.purge_deliveries)
+    scheduler.add_job(app, 'history-compact', app.config['HISTORY_COMPACT_INTERVAL'], MessageService.compact_history)
+    scheduler.add_job(app, 'sms-context-compact', app.config['HISTORY_COMPACT_INTERVAL'], SMSService.compact_context)
+    scheduler.add_job(app, 'error-report', app.config['SENTRY_ERROR_REPORT_INTERVAL'], report_error_counts)
+    
     return app
@@ -0,0 +1,98 @@
+import os
+import threading
+import httpx
+import openai
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client as TwilioClient
+from flask import current_app
+
+class _ClientState:
+    """Clients owned by a single application in the current process"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.clients = {}
+
+class ClientRegistry:
+    """Registry of pooled upstream API clients, one set per worker process.
+
+    Clients are created lazily on first use and reused by every request and
+    thread in the process so their HTTP connection pools stay warm. After a
+    fork (e.g. gunicorn workers) the child drops the inherited clients and
+    builds its own, so sockets are never shared between processes.
+    """
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach a client store to the application"""
+        app.extensions['clients'] = _ClientState()
+
+    def openai(self):
+        """Get the shared OpenAI client for this worker"""
+        return self._get('openai', self._create_openai)
+
+    def twilio(self):
+        """Get the shared Twilio REST client for this worker"""
+        return self._get('twilio', self._create_twilio)
+
+    def _get(self, name, factory):
+        state = self._state()
+        client = state.clients.get(name)
+        if client is None:
+            with state.lock:
+                client = state.clients.get(name)
+                if client is None:
+                    client = factory(current_app.config)
+                    state.clients[name] = client
+        return client
+
+    def _state(self):
+        state = current_app.extensions['clients']
+        if state.pid != os.getpid():
+            with state.lock:
+                if state.pid != os.getpid():
+                    # Forget clients inherited from the parent process
+                    state.clients = {}
+                    state.pid = os.getpid()
+        return state
+
+    @staticmethod
+    def _create_openai(config):
+        timeout = httpx.Timeout(
+            config['OPENAI_TIMEOUT'],
+            connect=config['OPENAI_CONNECT_TIMEOUT']
+        )
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=config['OPENAI_MAX_CONNECTIONS'],
+                max_keepalive_connections=config['OPENAI_MAX_KEEPALIVE_CONNECTIONS'],
+                keepalive_expiry=config['OPENAI_KEEPALIVE_EXPIRY']
+            ),
+            timeout=timeout
+        )
+        return openai.OpenAI(
+            api_key=config['OPENAI_API_KEY'],
+            http_client=http_client,
+            timeout=timeout,
+            max_retries=0  # Retried by the upstream guard within its deadline
+        )
+
+    @staticmethod
+    def _create_twilio(config):
+        http_client = TwilioHttpClient(
+            pool_connections=True,
+            timeout=config['TWILIO_TIMEOUT']
+        )
+        # Size the keep-alive pool for concurrent sends from this worker
+        http_client.session.mount('https://', HTTPAdapter(
+            pool_maxsize=config['TWILIO_MAX_CONNECTIONS'],
+            max_retries=config['TWILIO_MAX_RETRIES']
+        ))
+        return TwilioClient(
+            config['TWILIO_ACCOUNT_SID'],
+            config['TWILIO_AUTH_TOKEN'],
+            http_client=http_client
+        )
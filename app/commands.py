@@ -0,0 +1,87 @@
+import json
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+cache_cli = AppGroup('cache', help='Manage the response cache')
+
+@cache_cli.command('sweep')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per transaction')
+@click.option('--max-rows', type=int, default=None, help='Evict the oldest response rows beyond this count')
+def cache_sweep(batch_size, max_rows):
+    """Delete expired cache rows and enforce the maximum size of each tier"""
+    from app.services.cache_service import CacheService
+    result = CacheService.sweep(batch_size, max_rows)
+    click.echo(f"Removed {result['expired']} expired and {result['evicted']} evicted cache rows")
+
+@cache_cli.command('stats')
+@click.option('--max-age', type=int, default=None, help='Ignore workers that have not published for this many seconds')
+def cache_stats(max_age):
+    """Show the in-process cache counters published by the web workers"""
+    from app.services.cache_service import CacheService
+    interval = current_app.config['CACHE_STATS_INTERVAL']
+    if interval <= 0:
+        raise click.ClickException("Workers don't publish cache stats; set CACHE_STATS_INTERVAL")
+    stats = CacheService.worker_stats(max_age or 3 * interval)
+    click.echo(json.dumps(stats, indent=2))
+
+sms_cli = AppGroup('sms', help='Manage SMS processing state')
+
+@sms_cli.command('purge-deliveries')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per transaction')
+def sms_purge_deliveries(batch_size):
+    """Delete processed MessageSid records older than the idempotency window"""
+    from app.services.sms_service import SMSService
+    deleted = SMSService.purge_deliveries(batch_size)
+    click.echo(f"Removed {deleted} SMS delivery records")
+
+conversations_cli = AppGroup('conversations', help='Manage conversation summaries')
+
+@conversations_cli.command('check')
+@click.option('--fix', is_flag=True, help='Rebuild summaries that do not match the messages')
+def conversations_check(fix):
+    """Check conversation summaries against the message table"""
+    from app.services.message_service import MessageService
+    mismatched = MessageService.check_conversations(fix=fix)
+    for conversation_id in mismatched:
+        click.echo(conversation_id)
+    action = 'Fixed' if fix else 'Found'
+    click.echo(f"{action} {len(mismatched)} inconsistent conversation summaries")
+
+history_cli = AppGroup('history', help='Manage stored message history')
+
+@history_cli.command('compact')
+def history_compact():
+    """Trim anonymous chat history and SMS context to the configured length"""
+    from app.services.message_service import MessageService
+    from app.services.sms_service import SMSService
+    messages = MessageService.compact_history()
+    contexts = SMSService.compact_context()
+    click.echo(f"Removed {messages} chat messages and {contexts} SMS context messages")
+
+moderation_cli = AppGroup('moderation', help='Screen stored content')
+
+@moderation_cli.command('rescreen')
+@click.option('--source', type=click.Choice(['messages', 'sms', 'all']), default='all', help='Content to screen')
+@click.option('--processes', type=int, default=None, help='Worker processes (0 = one per CPU)')
+@click.option('--batch-size', type=int, default=None, help='Rows fetched and classified per batch')
+@click.option('--summary', is_flag=True, help='Only print totals')
+def moderation_rescreen(source, processes, batch_size, summary):
+    """Re-run the content scanner over stored chat and SMS messages"""
+    from app.services.moderation_service import ModerationService
+    sources = None if source == 'all' else [source]
+    totals = {}
+    for row_source, row_id, categories in ModerationService.rescreen(sources, processes, batch_size):
+        for category in categories:
+            totals[category] = totals.get(category, 0) + 1
+        if not summary:
+            click.echo(f"{row_source} {row_id} {json.dumps(categories)}")
+    click.echo(f"Flagged: {json.dumps(totals)}")
+
+def register_commands(app):
+    """Register CLI commands for the application"""
+    app.cli.add_command(cache_cli)
+    app.cli.add_command(sms_cli)
+    app.cli.add_command(conversations_cli)
+    app.cli.add_command(history_cli)
+    app.cli.add_command(moderation_cli)
@@ -47,19 +47,137 @@ class Config:
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    OPENAI_PROMPT_TOKEN_BUDGET = int(os.getenv('OPENAI_PROMPT_TOKEN_BUDGET', 2000))  # Estimated prompt tokens; the oldest context is dropped to fit, 0 disables
+    
+    # Model routing: trivial turns ("thanks", "ok") use the light tier, everything else the full tier
+    MODEL_ROUTING_ENABLED = os.getenv('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+    MODEL_ROUTING_LIGHT_MAX_TOKENS = int(os.getenv('MODEL_ROUTING_LIGHT_MAX_TOKENS', 12))  # Longer messages always use the full tier
+    MODEL_ROUTING_DEPTH = int(os.getenv('MODEL_ROUTING_DEPTH', 6))  # Context messages after which short follow-ups use the full tier
+    OPENAI_MODEL_TIERS = {
+        'light': {
+            'model': os.getenv('OPENAI_LIGHT_MODEL', 'gpt-4o-mini'),
+            'max_tokens': int(os.getenv('OPENAI_LIGHT_MAX_TOKENS', 300))
+        },
+        'full': {
+            'model': OPENAI_MODEL,
+            'max_tokens': int(os.getenv('OPENAI_MAX_TOKENS', 1000))
+        }
+    }
+    # Per-channel changes to the tiers; SMS replies must be short anyway
+    OPENAI_CHANNEL_OVERRIDES = {
+        'sms': {
+            'light': {'max_tokens': int(os.getenv('OPENAI_SMS_LIGHT_MAX_TOKENS', 100))},
+            'full': {'max_tokens': int(os.getenv('OPENAI_SMS_MAX_TOKENS', 300))}
+        }
+    }
+    
+    # OpenAI HTTP client (one pooled client per worker process)
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+    OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+    OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '2'))  # Retries within OPENAI_DEADLINE
+    OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '10'))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '5'))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))  # seconds
+    
+    # Upstream guard (per worker process)
+    OPENAI_DEADLINE = float(os.getenv('OPENAI_DEADLINE', '45'))  # Wall-clock seconds per call across all attempts; allow a full-length reply
+    OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '4'))  # Concurrent model calls
+    OPENAI_QUEUE_TIMEOUT = float(os.getenv('OPENAI_QUEUE_TIMEOUT', '2'))  # Seconds to wait for a free call slot
+    OPENAI_BREAKER_THRESHOLD = int(os.getenv('OPENAI_BREAKER_THRESHOLD', '5'))  # Consecutive failures that open the circuit
+    OPENAI_BREAKER_RESET = float(os.getenv('OPENAI_BREAKER_RESET', '30'))  # Seconds before a half-open probe
     
     # Twilio configuration
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
+    TWILIO_TIMEOUT = float(os.getenv('TWILIO_TIMEOUT', '10'))
+    TWILIO_MAX_RETRIES = int(os.getenv('TWILIO_MAX_RETRIES', '2'))
+    TWILIO_MAX_CONNECTIONS = int(os.getenv('TWILIO_MAX_CONNECTIONS', '10'))  # Keep-alive pool per worker
+    SMS_SEND_CONCURRENCY = int(os.getenv('SMS_SEND_CONCURRENCY', '5'))  # Parallel sends in send_many
+    
+    # SMS replies are generated in the background and sent via the REST API
+    SMS_ASYNC_ENABLED = os.getenv('SMS_ASYNC_ENABLED', 'true').lower() == 'true'
+    SMS_IDEMPOTENCY_TTL = int(os.getenv('SMS_IDEMPOTENCY_TTL', 86400))  # Seconds a MessageSid is remembered
+    SMS_DELIVERY_PURGE_INTERVAL = int(os.getenv('SMS_DELIVERY_PURGE_INTERVAL', 0))  # Seconds, 0 disables the in-process purge
+    
+    # Canned SMS replies to acknowledgements, greetings and help requests (no model call)
+    QUICK_REPLIES_ENABLED = os.getenv('QUICK_REPLIES_ENABLED', 'true').lower() == 'true'
+    QUICK_REPLIES_FILE = os.getenv(
+        'QUICK_REPLIES_FILE',
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'quick_replies.json')
+    )
+    QUICK_REPLIES_RELOAD_INTERVAL = int(os.getenv('QUICK_REPLIES_RELOAD_INTERVAL', 30))  # Seconds between checks for file changes
+    
+    # Long SMS replies are split into pages; the rest is sent when the user replies MORE
+    SMS_PAGE_SEGMENTS = int(os.getenv('SMS_PAGE_SEGMENTS', 3))  # Billed segments per message, 0 sends the whole reply
+    SMS_CONTINUATION_TTL = int(os.getenv('SMS_CONTINUATION_TTL', 86400))  # Seconds the rest of a reply is kept
+    
+    # Background task pool (per worker process)
+    TASK_WORKERS = int(os.getenv('TASK_WORKERS', 4))
+    TASK_QUEUE_SIZE = int(os.getenv('TASK_QUEUE_SIZE', 100))  # Running plus waiting tasks
     
     # Cache configuration
     CACHE_TTL = int(os.getenv('CACHE_TTL', 3600))  # 1 hour
+    CACHE_LRU_SIZE = int(os.getenv('CACHE_LRU_SIZE', 512))  # In-memory entries per worker, 0 disables
+    CACHE_MAX_ROWS = int(os.getenv('CACHE_MAX_ROWS', 10000))  # Rows outside the context tier, 0 means unbounded
+    CACHE_SWEEP_BATCH_SIZE = int(os.getenv('CACHE_SWEEP_BATCH_SIZE', 500))
+    CACHE_SWEEP_INTERVAL = int(os.getenv('CACHE_SWEEP_INTERVAL', 0))  # Seconds, 0 disables the in-process sweeper
+    CACHE_SINGLE_FLIGHT_LEASE = int(os.getenv('CACHE_SINGLE_FLIGHT_LEASE', 0))  # Seconds, 0 coalesces within a worker only
+    CACHE_SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('CACHE_SINGLE_FLIGHT_POLL_INTERVAL', '0.25'))
+    CACHE_STATS_INTERVAL = int(os.getenv('CACHE_STATS_INTERVAL', 60))  # Seconds between workers publishing their counters, 0 disables
+    
+    # Context-aware caching of turns with history, keyed on the message, context and summary
+    CACHE_CONTEXT_ENABLED = os.getenv('CACHE_CONTEXT_ENABLED', 'false').lower() == 'true'
+    CACHE_CONTEXT_TTL = int(os.getenv('CACHE_CONTEXT_TTL', 900))  # 15 minutes
+    CACHE_CONTEXT_LRU_SIZE = int(os.getenv('CACHE_CONTEXT_LRU_SIZE', 256))
+    CACHE_CONTEXT_MAX_ROWS = int(os.getenv('CACHE_CONTEXT_MAX_ROWS', 5000))  # Capped separately from CACHE_MAX_ROWS
+    
+    # Semantic caching of context-free questions by similarity (requires numpy)
+    SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true'
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.85'))  # Minimum cosine similarity to reuse an answer
+    SEMANTIC_CACHE_DIMENSIONS = int(os.getenv('SEMANTIC_CACHE_DIMENSIONS', 1024))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 20000))  # Vectors kept per worker
+    SEMANTIC_CACHE_MMAP_DIR = os.getenv('SEMANTIC_CACHE_MMAP_DIR', '')  # Keep vectors in a memory-mapped file here instead of the heap
+    SEMANTIC_CACHE_REFRESH_INTERVAL = int(os.getenv('SEMANTIC_CACHE_REFRESH_INTERVAL', 60))  # Seconds between loading other workers' vectors
+    
+    # Message history retention (anonymous chat without a conversation, and SMS context)
+    HISTORY_KEEP_MESSAGES = int(os.getenv('HISTORY_KEEP_MESSAGES', 5))
+    HISTORY_MAX_MESSAGES = int(os.getenv('HISTORY_MAX_MESSAGES', 50))  # SMS messages kept even if they were never summarized
+    HISTORY_TRIM_ON_WRITE = os.getenv('HISTORY_TRIM_ON_WRITE', 'true').lower() == 'true'
+    HISTORY_COMPACT_INTERVAL = int(os.getenv('HISTORY_COMPACT_INTERVAL', 0))  # Seconds, 0 disables the in-process compaction
+    
+    # Rolling conversation summaries, refreshed in the background every SUMMARY_EVERY_MESSAGES messages.
+    # Keep SUMMARY_EVERY_MESSAGES below HISTORY_KEEP_MESSAGES so SMS turns are summarized before they are trimmed.
+    SUMMARY_ENABLED = os.getenv('SUMMARY_ENABLED', 'true').lower() == 'true'
+    SUMMARY_EVERY_MESSAGES = int(os.getenv('SUMMARY_EVERY_MESSAGES', 4))
+    SUMMARY_RECENT_MESSAGES = int(os.getenv('SUMMARY_RECENT_MESSAGES', 2))  # Minimum raw messages sent alongside the summary, on top of any it doesn't cover yet
+    SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', 200))
+    
+    # Offline moderation
+    MODERATION_PROCESSES = int(os.getenv('MODERATION_PROCESSES', 0))  # Worker processes for `flask moderation rescreen`, 0 uses one per CPU
+    MODERATION_BATCH_SIZE = int(os.getenv('MODERATION_BATCH_SIZE', 1000))  # Rows fetched and classified per batch
+    
+    # Logging, written as JSON lines by a background thread
+    LOG_FILE = os.getenv('LOG_FILE', 'logs/jane.log')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # Rotate at 10 MB
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Records buffered for the writer; more are dropped
+    LOG_PAYLOAD_MAX_CHARS = int(os.getenv('LOG_PAYLOAD_MAX_CHARS', 500))  # Longer strings in request/response logs are truncated
+    LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '1.0'))  # Fraction of requests whose request and response are logged
     
     # Sentry configuration
     SENTRY_DSN = os.getenv('SENTRY_DSN')
-    SENTRY_TRACES_SAMPLE_RATE = float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '1.0'))
-    SENTRY_PROFILES_SAMPLE_RATE = float(os.getenv('SENTRY_PROFILES_SAMPLE_RATE', '1.0'))
+    SENTRY_TRACES_SAMPLE_RATE = float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '0.1'))
+    SENTRY_PROFILES_SAMPLE_RATE = float(os.getenv('SENTRY_PROFILES_SAMPLE_RATE', '0.1'))  # Fraction of traced requests also profiled
+    # Per-route trace rates as "prefix=rate" pairs, e.g. "/chat=0.2,/sms=0.05"; the longest matching prefix wins
+    SENTRY_ROUTE_SAMPLE_RATES = {
+        prefix.strip(): float(rate)
+        for prefix, rate in (
+            item.split('=', 1) for item in os.getenv('SENTRY_ROUTE_SAMPLE_RATES', '').split(',') if '=' in item
+        )
+    }
+    SENTRY_ERROR_REPORT_INTERVAL = int(os.getenv('SENTRY_ERROR_REPORT_INTERVAL', 300))  # Seconds between summaries of expected errors (404, 429, validation), 0 disables
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -1,11 +1,48 @@
 from flask import jsonify, current_app, g, request
 from app.exceptions import BaseError, APIError, DatabaseError, ValidationError
 from app.middleware import get_request_id
+from collections import Counter
+import json
+import threading
 import traceback
 import sentry_sdk
 
+# Status codes of high-volume errors that are counted rather than reported one by one
+EXPECTED_STATUS_CODES = (404, 429)
+
+# Error codes of calls rejected by the upstream guard, which come in bursts during an outage
+EXPECTED_ERROR_CODES = ('UPSTREAM_BUSY', 'UPSTREAM_UNAVAILABLE')
+
+class ErrorCounts:
+    """Thread-safe tally of expected errors, reported to Sentry in batches"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+    
+    def add(self, code):
+        with self._lock:
+            self._counts[code] += 1
+    
+    def drain(self):
+        """Get the counts since the last drain and reset them"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+def report_error_counts():
+    """Send one summary of the expected errors counted by this worker"""
+    counts = current_app.extensions['error_counts'].drain()
+    if not counts:
+        return
+    current_app.logger.info(f"Expected errors since last report: {json.dumps(counts)}")
+    with sentry_sdk.push_scope() as scope:
+        scope.set_tag("error_type", "expected_summary")
+        scope.set_context("error_counts", counts)
+        sentry_sdk.capture_message("Expected error summary", "info")
+
 def register_error_handlers(app):
     """Register error handlers for the application"""
+    app.extensions['error_counts'] = ErrorCounts()
     
     def get_safe_request_id():
         """Safely get request ID if available"""
@@ -18,19 +55,26 @@ def register_error_handlers(app):
     def handle_base_error(error):
         """Handle all custom exceptions"""
         request_id = get_safe_request_id()
-        # Log error
-        current_app.logger.error(f'Request {request_id} failed with {error.__class__.__name__}: {str(error)}')
-        
-        # Add extra context to Sentry
-        with sentry_sdk.push_scope() as scope:
-            scope.set_tag("error_code", error.code)
-            scope.set_tag("request_id", request_id)
-            scope.set_context("error_details", {
-                "code": error.code,
-                "message": error.message,
-                "status_code": error.status_code
-            })
-            sentry_sdk.capture_exception(error)
+        if isinstance(error, ValidationError) \
+                or error.status_code in EXPECTED_STATUS_CODES \
+                or error.code in EXPECTED_ERROR_CODES:
+            # Expected and frequent: count it for the periodic summary
+            current_app.logger.warning(f'Request {request_id} failed with {error.__class__.__name__}: {str(error)}')
+            current_app.extensions['error_counts'].add(error.code)
+        else:
+            # Log error
+            current_app.logger.error(f'Request {request_id} failed with {error.__class__.__name__}: {str(error)}')
+            
+            # Add extra context to Sentry
+            with sentry_sdk.push_scope() as scope:
+                scope.set_tag("error_code", error.code)
+                scope.set_tag("request_id", request_id)
+                scope.set_context("error_details", {
+                    "code": error.code,
+                    "message": error.message,
+                    "status_code": error.status_code
+                })
+                sentry_sdk.capture_exception(error)
         response = {
             'error': {
                 'code': error.code,
@@ -46,16 +90,7 @@ def register_error_handlers(app):
         request_id = get_safe_request_id()
         # Log warning
         current_app.logger.warning(f'Request {request_id}: Resource not found')
-        
-        # Add context to Sentry
-        with sentry_sdk.push_scope() as scope:
-            scope.set_tag("error_type", "not_found")
-            scope.set_tag("request_id", request_id)
-            scope.set_context("request_details", {
-                "url": request.url if request else "unknown",
-                "method": request.method if request else "unknown"
-            })
-            sentry_sdk.capture_message("Resource not found", "warning")
+        current_app.extensions['error_counts'].add('NOT_FOUND')
         response = {
             'error': {
                 'code': 'NOT_FOUND',
@@ -71,16 +106,7 @@ def register_error_handlers(app):
         request_id = get_safe_request_id()
         # Log warning
         current_app.logger.warning(f'Request {request_id}: Rate limit exceeded')
-        
-        # Add context to Sentry
-        with sentry_sdk.push_scope() as scope:
-            scope.set_tag("error_type", "rate_limit")
-            scope.set_tag("request_id", request_id)
-            scope.set_context("request_details", {
-                "url": request.url if request else "unknown",
-                "method": request.method if request else "unknown"
-            })
-            sentry_sdk.capture_message("Rate limit exceeded", "warning")
+        current_app.extensions['error_counts'].add('RATE_LIMIT_EXCEEDED')
         response = {
             'error': {
                 'code': 'RATE_LIMIT_EXCEEDED',
@@ -96,7 +122,8 @@ def register_error_handlers(app):
         request_id = get_safe_request_id()
         # Log error
         current_app.logger.error(f'Request {request_id} failed with unexpected error: {str(error)}')
-        current_app.logger.error(traceback.format_exc())
+        error_traceback = traceback.format_exc()
+        current_app.logger.error(error_traceback)
         
         # Add context to Sentry
         with sentry_sdk.push_scope() as scope:
@@ -105,7 +132,7 @@ def register_error_handlers(app):
             scope.set_context("error_details", {
                 "error_class": error.__class__.__name__,
                 "error_message": str(error),
-                "traceback": traceback.format_exc()
+                "traceback": error_traceback
             })
             sentry_sdk.capture_exception(error)
         response = {
@@ -117,7 +144,7 @@ def register_error_handlers(app):
         }
         if current_app.debug:
             response['error']['debug_info'] = {
-                'traceback': traceback.format_exc(),
+                'traceback': error_traceback,
                 'error_type': error.__class__.__name__
             }
         return jsonify(response), 500
@@ -128,7 +155,8 @@ def register_error_handlers(app):
         request_id = get_safe_request_id()
         # Log error
         current_app.logger.error(f'Request {request_id} failed with unhandled error: {str(error)}')
-        current_app.logger.error(traceback.format_exc())
+        error_traceback = traceback.format_exc()
+        current_app.logger.error(error_traceback)
         
         # Add context to Sentry
         with sentry_sdk.push_scope() as scope:
@@ -137,7 +165,7 @@ def register_error_handlers(app):
             scope.set_context("error_details", {
                 "error_class": error.__class__.__name__,
                 "error_message": str(error),
-                "traceback": traceback.format_exc()
+                "traceback": error_traceback
             })
             if request:
                 scope.set_context("request_details", {
@@ -156,7 +184,7 @@ def register_error_handlers(app):
         }
         if current_app.debug:
             response['error']['debug_info'] = {
-                'traceback': traceback.format_exc(),
+                'traceback': error_traceback,
                 'error_type': error.__class__.__name__
             }
         return jsonify(response), 500
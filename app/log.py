@@ -0,0 +1,134 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, has_request_context
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line"""
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', None),
+            'message': record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, default=str)
+
+class RequestIDFilter(logging.Filter):
+    """Stamps records with the ID of the request being handled, if any"""
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the writer thread, dropping them if its queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback on the calling thread, where they
+        # are valid; everything else, including formatting, happens on the writer
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Pipeline:
+    """Queue handler and writer thread for one logger"""
+    def __init__(self, handler, targets, size):
+        self.handler = handler
+        self.targets = targets
+        self.size = size
+        self.listener = None
+
+    def start(self):
+        self.handler.queue = queue.Queue(self.size)
+        self.listener = QueueListener(self.handler.queue, *self.targets, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            try:
+                self.listener.stop()
+            except queue.Full:
+                # No room for the stop sentinel; the daemon thread dies with the process
+                pass
+            self.listener = None
+
+_pipelines = []
+_lock = threading.Lock()
+
+def configure_logging(app):
+    """Log to a rotating JSON file through a background writer thread.
+
+    Request threads only put records on a bounded queue; a QueueListener
+    formats and writes them. Each worker process gets its own writer after a
+    fork, and the queue is flushed at exit.
+    """
+    log_file = app.config['LOG_FILE']
+    log_dir = os.path.dirname(log_file)
+    if log_dir and not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=app.config['LOG_MAX_BYTES'],
+        backupCount=app.config['LOG_BACKUP_COUNT']
+    )
+    file_handler.setFormatter(JSONFormatter())
+
+    handler = _NonBlockingQueueHandler(None)
+    handler.addFilter(RequestIDFilter())
+    pipeline = _Pipeline(handler, [file_handler], app.config['LOG_QUEUE_SIZE'])
+
+    with _lock:
+        # Replace the pipeline of an earlier app sharing this logger
+        for old in list(_pipelines):
+            if old.handler in app.logger.handlers:
+                app.logger.removeHandler(old.handler)
+                old.stop()
+                for target in old.targets:
+                    target.close()
+                _pipelines.remove(old)
+        pipeline.start()
+        _pipelines.append(pipeline)
+
+    app.logger.addHandler(handler)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    return pipeline
+
+def _restart_after_fork():
+    """Give each pipeline a fresh queue and writer thread in a forked child"""
+    global _lock
+    _lock = threading.Lock()
+    for pipeline in list(_pipelines):
+        pipeline.listener = None
+        pipeline.start()
+
+def _stop_all():
+    """Flush queued records before the interpreter exits"""
+    for pipeline in list(_pipelines):
+        pipeline.stop()
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(_stop_all)
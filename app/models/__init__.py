@@ -2,4 +2,9 @@
 from app.models.message import Message
 from app.models.cache import Cache
 from app.models.sms_context import SMSContext
-from app.models.user import User
\ No newline at end of file
+from app.models.user import User
+from app.models.sms_delivery import SMSDelivery
+from app.models.conversation import Conversation
+from app.models.sms_summary import SMSSummary
+from app.models.sms_continuation import SMSContinuation
+from app.models.worker_stats import WorkerStats
\ No newline at end of file
@@ -7,7 +7,10 @@ class Cache(db.Model):
     
     id = db.Column(db.String(255), primary_key=True)
     response = db.Column(db.Text, nullable=False)
-    expires = db.Column(db.DateTime, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False, index=True)
+    embedding = db.Column(db.LargeBinary, nullable=True)  # Question vector for the semantic cache tier
+    question = db.Column(db.Text, nullable=True)  # Question the embedding was made from
+    embedded_at = db.Column(db.DateTime, nullable=True, index=True)  # When the embedding was stored
     
     def __repr__(self):
         return f'<Cache {self.id}>'
@@ -0,0 +1,34 @@
+from app import db
+from datetime import datetime
+
+class Conversation(db.Model):
+    """Model for conversation summaries, kept up to date as messages are saved"""
+    __tablename__ = 'conversation'
+    __table_args__ = (
+        db.Index('ix_conversation_user_id_last_updated', 'user_id', 'last_updated'),
+    )
+    
+    id = db.Column(db.String(50), primary_key=True)  # Message.conversation_id
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    last_message = db.Column(db.String(60), nullable=False, default='')
+    last_updated = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    summary = db.Column(db.Text, nullable=True)  # Rolling summary of the first summary_message_count messages
+    summary_message_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<Conversation {self.id}>'
+    
+    @staticmethod
+    def preview(content):
+        """Shorten message content for the conversation list"""
+        return content[:50] + '...' if len(content) > 50 else content
+    
+    def to_dict(self):
+        """Convert conversation to dictionary"""
+        return {
+            'id': self.id,
+            'last_message': self.last_message,
+            'last_updated': self.last_updated.isoformat(),
+            'message_count': self.message_count
+        }
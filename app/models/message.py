@@ -4,13 +4,18 @@ from datetime import datetime
 class Message(db.Model):
     """Model for storing chat messages"""
     __tablename__ = 'message'
+    __table_args__ = (
+        # Newest-first history per user and per conversation
+        db.Index('ix_message_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_message_conversation_id_timestamp', 'conversation_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     type = db.Column(db.String(20), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
-    conversation_id = db.Column(db.String(50), index=True, nullable=True)
+    conversation_id = db.Column(db.String(50), nullable=True)
     
     def __repr__(self):
         return f'<Message {self.id}: {self.type}>'
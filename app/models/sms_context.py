@@ -4,6 +4,17 @@ from datetime import datetime
 class SMSContext(db.Model):
     """Model for storing SMS conversation context"""
     __tablename__ = 'sms_context'
+    __table_args__ = (
+        # Newest-first context per phone number
+        db.Index('ix_sms_context_phone_number_timestamp', 'phone_number', 'timestamp'),
+        # Pending confirmations only, checked on every inbound SMS
+        db.Index(
+            'ix_sms_context_pending',
+            'phone_number',
+            postgresql_where=db.text('awaiting_confirmation'),
+            sqlite_where=db.text('awaiting_confirmation = 1')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     phone_number = db.Column(db.String(20), nullable=False)
@@ -0,0 +1,13 @@
+from app import db
+from datetime import datetime
+
+class SMSContinuation(db.Model):
+    """Model for the unsent rest of a long SMS reply, sent when the user replies MORE"""
+    __tablename__ = 'sms_continuation'
+    
+    phone_number = db.Column(db.String(20), primary_key=True)
+    remainder = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SMSContinuation {self.phone_number}>'
@@ -0,0 +1,14 @@
+from app import db
+from datetime import datetime
+
+class SMSDelivery(db.Model):
+    """Model for recording inbound SMS webhooks already processed, by Twilio MessageSid"""
+    __tablename__ = 'sms_delivery'
+    
+    message_sid = db.Column(db.String(64), primary_key=True)
+    phone_number = db.Column(db.String(20), nullable=False)
+    response = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<SMSDelivery {self.message_sid}>'
@@ -0,0 +1,14 @@
+from app import db
+from datetime import datetime
+
+class SMSSummary(db.Model):
+    """Model for the rolling summary of an SMS conversation"""
+    __tablename__ = 'sms_summary'
+    
+    phone_number = db.Column(db.String(20), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    last_context_id = db.Column(db.Integer, nullable=False)  # Newest SMSContext row covered by the summary
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SMSSummary {self.phone_number}>'
@@ -0,0 +1,13 @@
+from app import db
+from datetime import datetime
+
+class WorkerStats(db.Model):
+    """Model for the latest cache counters published by a worker process"""
+    __tablename__ = 'worker_stats'
+    
+    worker = db.Column(db.String(100), primary_key=True)  # hostname:pid
+    stats = db.Column(db.Text, nullable=False)  # JSON snapshot
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<WorkerStats {self.worker}>'
@@ -202,7 +202,20 @@ def conversations():
     """Display user conversations"""
     from app.services.message_service import MessageService
     
-    # Get user conversations
-    conversations = MessageService.get_conversations(current_user.id)
+    # Get a page of user conversations
+    page_size = 20
+    conversations = MessageService.get_conversations(
+        current_user.id,
+        limit=page_size,
+        before=request.args.get('before')
+    )
     
-    return render_template('auth/conversations.html', conversations=conversations)
\ No newline at end of file
+    next_cursor = None
+    if len(conversations) == page_size:
+        next_cursor = MessageService.conversation_cursor(conversations[-1])
+    
+    return render_template(
+        'auth/conversations.html',
+        conversations=conversations,
+        next_cursor=next_cursor
+    )
\ No newline at end of file
@@ -1,29 +1,21 @@
-from flask import Blueprint, request, jsonify, current_app, g, session
+from flask import Blueprint, request, jsonify, current_app, g, session, Response, stream_with_context
 from datetime import datetime
+import json
 from app import limiter, csrf
 from flask_login import current_user
+from app.utils import scanner
 from app.utils.validators import ValidationUtils
 from app.services.ai_service import AIService
+from app.services.context_builder import ContextBuilder
 from app.services.message_service import MessageService
+from app.services.summary_service import SummaryService
 from app.services.user_service import UserService
 from app.exceptions import ValidationError, APIError
 
 chat_bp = Blueprint('chat', __name__)
 
-@chat_bp.route('/chat', methods=['POST'])
-@limiter.limit("30 per minute")  # More lenient rate limit
-@csrf.exempt  # Exempt this route from CSRF protection since we handle it in JS
-def chat():
-    """Handle chat requests with validation and error handling"""
-    current_app.logger.info(f"Processing chat request {g.request_id}")
-    request_data = request.get_json()
-    ValidationUtils.log_request(request_data)
-    
-    user_message = request_data.get('message', '')
-    confirmed = request_data.get('confirmed', False)
-    conversation_id = request_data.get('conversation_id')
-    
-    # Get or create conversation ID
+def _resolve_conversation_id(conversation_id):
+    """Get or create the conversation ID for this request"""
     if not conversation_id and current_user.is_authenticated:
         conversation_id = MessageService.start_new_conversation(current_user.id)
     elif not conversation_id:
@@ -31,53 +23,146 @@ def chat():
         if 'session_id' not in session:
             session['session_id'] = UserService.generate_conversation_id()
         conversation_id = session['session_id']
+    return conversation_id
+
+def _validate_message(user_message, confirmed):
+    """Run security checks on a user message, raising ValidationError on failure.
     
+    Returns the scanner categories found in the message.
+    """
     if not user_message:
         raise ValidationError("Message cannot be empty")
     
     # Security checks
-    if ValidationUtils.contains_sensitive_info(user_message):
+    categories = ValidationUtils.classify(user_message)
+    if scanner.SENSITIVE in categories:
         raise ValidationError(
             "Your message appears to contain sensitive personal information. Please remove any personal details before sending.",
             code="SENSITIVE_INFO"
         )
     
-    if ValidationUtils.contains_harmful_interactions(user_message):
+    if scanner.HARMFUL in categories:
         raise ValidationError(
             "Your message contains language that may be harmful or dangerous. Please reconsider your wording or seek professional assistance if needed.",
             code="HARMFUL_CONTENT"
         )
     
-    if ValidationUtils.contains_disability_info(user_message) and not confirmed:
+    if scanner.DISABILITY in categories and not confirmed:
         raise ValidationError(
             "Your message includes disability-related information. Please ensure you are comfortable sharing these details.",
             code="REQUIRES_CONFIRMATION"
         )
-    
-    try:
-        # Get response from OpenAI with context
-        response_text = AIService.get_job_coaching_advice(user_message, request_data.get('context'))
-    except Exception as e:
-        current_app.logger.error(f"OpenAI API error for request {g.request_id}: {str(e)}")
-        raise APIError("Failed to get AI response. Please try again later.")
-    
-    # Cache messages
+    return categories
+
+def _sse_event(data, event=None):
+    """Format a Server-Sent Events message"""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+def _save_exchange(user_message, user_timestamp, response_text, conversation_id, user_id):
+    """Persist the user message and bot reply for a chat turn"""
     user_msg = {
         'content': user_message,
         'type': 'user-message',
-        'timestamp': request_data.get('timestamp', datetime.utcnow().isoformat())
+        'timestamp': user_timestamp or datetime.utcnow().isoformat()
     }
     bot_msg = {
         'content': response_text,
         'type': 'bot-message',
         'timestamp': datetime.utcnow().isoformat()
     }
+    MessageService.record_exchange(user_msg, bot_msg, user_id, conversation_id)
+    SummaryService.schedule_conversation(conversation_id)
+
+@chat_bp.route('/chat', methods=['POST'])
+@limiter.limit("30 per minute")  # More lenient rate limit
+@csrf.exempt  # Exempt this route from CSRF protection since we handle it in JS
+def chat():
+    """Handle chat requests with validation and error handling"""
+    current_app.logger.info(f"Processing chat request {g.request_id}")
+    request_data = request.get_json()
+    ValidationUtils.log_request(request_data)
     
+    user_message = request_data.get('message', '')
+    confirmed = request_data.get('confirmed', False)
+    conversation_id = _resolve_conversation_id(request_data.get('conversation_id'))
+    categories = _validate_message(user_message, confirmed)
     user_id = current_user.id if current_user.is_authenticated else None
-    MessageService.cache_message(user_msg, user_id, conversation_id)
-    MessageService.cache_message(bot_msg, user_id, conversation_id)
+    context = ContextBuilder.clean(request_data.get('context'))
+    summary, context = SummaryService.conversation_context(conversation_id, user_id, context)
+    
+    try:
+        # Get response from OpenAI with context
+        response_text = AIService.get_job_coaching_advice(user_message, context, summary, categories=categories)
+    except APIError:
+        # Rejected by the upstream guard; its message tells the user to retry later
+        raise
+    except Exception as e:
+        current_app.logger.error(f"OpenAI API error for request {g.request_id}: {str(e)}")
+        raise APIError("Failed to get AI response. Please try again later.")
+    
+    # Cache messages
+    _save_exchange(user_message, request_data.get('timestamp'), response_text, conversation_id, user_id)
     
     response = {'response': response_text}
     ValidationUtils.log_response(response)
     current_app.logger.info(f"Successfully processed chat request {g.request_id}")
     return jsonify(response)
+
+@chat_bp.route('/chat/stream', methods=['POST'])
+@limiter.limit("30 per minute")
+@csrf.exempt  # Exempt this route from CSRF protection since we handle it in JS
+def chat_stream():
+    """Handle chat requests, streaming the response as Server-Sent Events"""
+    current_app.logger.info(f"Processing streaming chat request {g.request_id}")
+    request_data = request.get_json()
+    ValidationUtils.log_request(request_data)
+    
+    user_message = request_data.get('message', '')
+    confirmed = request_data.get('confirmed', False)
+    context = ContextBuilder.clean(request_data.get('context'))
+    user_timestamp = request_data.get('timestamp')
+    
+    conversation_id = _resolve_conversation_id(request_data.get('conversation_id'))
+    categories = _validate_message(user_message, confirmed)
+    user_id = current_user.id if current_user.is_authenticated else None
+    summary, context = SummaryService.conversation_context(conversation_id, user_id, context)
+    request_id = g.request_id
+    
+    def generate():
+        chunks = []
+        try:
+            for chunk in AIService.stream_job_coaching_advice(user_message, context, summary, categories):
+                chunks.append(chunk)
+                yield _sse_event({'token': chunk})
+        except Exception as e:
+            current_app.logger.error(f"OpenAI API error for request {request_id}: {str(e)}")
+            rejected = isinstance(e, APIError)
+            yield _sse_event({
+                'error': {
+                    'code': e.code if rejected else 'API_ERROR',
+                    'message': e.message if rejected else 'Failed to get AI response. Please try again later.',
+                    'request_id': request_id
+                }
+            }, event='error')
+            return
+        
+        # Persist the completed exchange once the stream has closed
+        response_text = ''.join(chunks)
+        _save_exchange(user_message, user_timestamp, response_text, conversation_id, user_id)
+        
+        response = {'response': response_text, 'conversation_id': conversation_id}
+        ValidationUtils.log_response(response)
+        current_app.logger.info(f"Successfully streamed chat request {request_id}")
+        yield _sse_event(response, event='done')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens flush immediately
+        }
+    )
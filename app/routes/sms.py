@@ -1,14 +1,39 @@
 from flask import Blueprint, request, current_app, g
 from app import db
 from twilio.twiml.messaging_response import MessagingResponse
-from app import csrf
+from app import csrf, tasks
+from app.utils import scanner
 from app.utils.validators import ValidationUtils
-from app.services.ai_service import AIService
-from app.services.sms_service import SMSService
+from app.services.sms_service import SMSService, MORE_KEYWORD
+from app.services.quick_reply_service import QuickReplyService
 from app.exceptions import ValidationError, APIError, DatabaseError
 
 sms_bp = Blueprint('sms', __name__)
 
+def _respond(message_sid, text=None):
+    """Build a TwiML response, remembering its text in case Twilio retries the webhook"""
+    resp = MessagingResponse()
+    if text:
+        resp.message(text)
+        if message_sid:
+            SMSService.record_response(message_sid, text)
+    return str(resp)
+
+def _reply(from_number, message_body, message_sid, inbound_id=None, categories=None):
+    """Reply to a message, in the background when possible.
+    
+    Returns an empty TwiML response once the reply has been queued, or a
+    TwiML response containing the reply if it had to be generated inline.
+    """
+    if current_app.config['SMS_ASYNC_ENABLED']:
+        if tasks.submit(SMSService.deliver_reply, from_number, message_body, inbound_id, categories):
+            current_app.logger.info(f"Request {g.request_id}: Queued reply for {from_number}")
+            return _respond(message_sid)
+        current_app.logger.warning(f"Request {g.request_id}: Task queue full, replying inline")
+    
+    response_text = SMSService.generate_reply(from_number, message_body, inbound_id, categories)
+    return _respond(message_sid, response_text)
+
 @sms_bp.route('', methods=['POST'])
 @csrf.exempt  # Exempt Twilio webhooks from CSRF protection
 def handle_sms():
@@ -17,93 +42,125 @@ def handle_sms():
     current_app.logger.info(f"Processing SMS request {g.request_id}")
     from_number = request.values.get('From', '')
     message_body = request.values.get('Body', '').strip().lower()
+    message_sid = request.values.get('MessageSid')
     
     if not message_body:
         return str(MessagingResponse())
 
     try:
+        # Twilio retries slow webhooks; only process each message once
+        if message_sid:
+            delivery = SMSService.claim_message(message_sid, from_number)
+            if delivery is not None:
+                current_app.logger.info(f"Request {g.request_id}: Duplicate delivery of {message_sid}")
+                return _respond(None, delivery.response)
+        
         # Check for pending confirmation
         pending = SMSService.check_confirmation(from_number)
         current_app.logger.info(f"Request {g.request_id}: Checking confirmation for {from_number}: {pending is not None}")
         
         if pending:
-            resp = MessagingResponse()
             current_app.logger.info(f"Request {g.request_id}: Processing confirmation: {message_body}")
             
             if message_body in ['y', 'yes']:
                 current_app.logger.info(f"Request {g.request_id}: User confirmed")
+                original_message = pending.original_message
+                pending_id = pending.id
+                
                 try:
                     # Process the original message
-                    context = SMSService.get_context(from_number)
-                    response_text = AIService.get_job_coaching_advice(pending.original_message, context)
-                    SMSService.save_context(from_number, pending.original_message, response_text)
+                    twiml = _reply(from_number, original_message, message_sid)
                 except Exception as e:
                     current_app.logger.error(f"Request {g.request_id} API error: {str(e)}")
                     raise APIError("Failed to process confirmed message")
                 
-                # Clear pending confirmation
-                pending.awaiting_confirmation = False
-                db.session.commit()
+                # Clear pending confirmation only once the reply is on its way, so a failed one can be confirmed again
+                try:
+                    SMSService.clear_pending(pending_id)
+                except Exception as e:
+                    current_app.logger.error(f"Request {g.request_id} DB error: {str(e)}")
+                    raise DatabaseError("Failed to clear pending confirmation")
                 current_app.logger.info(f"Request {g.request_id}: Cleared confirmation")
-                
-                resp.message(response_text)
+                return twiml
             elif message_body in ['n', 'no']:
                 current_app.logger.info(f"Request {g.request_id}: User declined")
-                pending.awaiting_confirmation = False
-                db.session.commit()
-                resp.message("Message cancelled.")
+                try:
+                    pending.awaiting_confirmation = False
+                    SMSService.clear_continuation(from_number)
+                    db.session.commit()
+                except Exception as e:
+                    current_app.logger.error(f"Request {g.request_id} DB error: {str(e)}")
+                    raise DatabaseError("Failed to cancel pending message")
+                return _respond(message_sid, "Message cancelled.")
             else:
-                resp.message("Please reply with 'y' for yes or 'n' for no to confirm sending your message.")
-            
-            return str(resp)
+                return _respond(message_sid, "Please reply with 'y' for yes or 'n' for no to confirm sending your message.")
         
         # Log incoming message
         current_app.logger.info(f"Request {g.request_id}: SMS from {from_number}")
         
+        # Send the next page of a long reply from storage
+        if message_body.strip(' .!') == MORE_KEYWORD:
+            page = SMSService.next_page(from_number)
+            if page is not None:
+                current_app.logger.info(f"Request {g.request_id}: Sent next page")
+                return _respond(message_sid, page)
+        
+        # Acknowledgements, greetings and help requests get a canned reply without the model
+        quick_reply = QuickReplyService.reply_for(from_number, message_body)
+        if quick_reply is not None:
+            try:
+                # The quick reply replaces any long reply the user was paging through
+                SMSService.clear_continuation(from_number)
+                SMSService.save_context(from_number, message_body, quick_reply)
+            except Exception as e:
+                current_app.logger.error(f"Request {g.request_id} DB error: {str(e)}")
+                raise DatabaseError("Failed to save quick reply")
+            current_app.logger.info(f"Request {g.request_id}: Sent quick reply")
+            return _respond(message_sid, quick_reply)
+        
         # Security checks
-        if ValidationUtils.contains_sensitive_info(message_body):
+        categories = ValidationUtils.classify(message_body)
+        if scanner.SENSITIVE in categories:
             raise ValidationError(
                 "Please avoid sharing sensitive personal information.",
                 code="SENSITIVE_INFO"
             )
         
-        if ValidationUtils.contains_harmful_interactions(message_body):
+        if scanner.HARMFUL in categories:
             raise ValidationError(
                 "Message contains harmful content. Please seek professional help if needed.",
                 code="HARMFUL_CONTENT"
             )
         
-        if ValidationUtils.contains_disability_info(message_body):
+        if scanner.DISABILITY in categories:
             try:
                 SMSService.save_pending(from_number, message_body)
             except Exception as e:
                 current_app.logger.error(f"Request {g.request_id} DB error: {str(e)}")
                 raise DatabaseError("Failed to save pending confirmation")
             
-            resp = MessagingResponse()
-            resp.message(
+            return _respond(
+                message_sid,
                 'Your message includes disability-related information. '
                 'Please ensure you are comfortable sharing these details. '
                 'Reply "y" to confirm sending this information, or "n" to cancel.'
             )
-            return str(resp)
         
         try:
-            # Get context and generate response
-            context = SMSService.get_context(from_number)
-            response_text = AIService.get_job_coaching_advice(message_body, context)
-            SMSService.save_context(from_number, message_body, response_text)
+            # Persist the inbound message, then generate the response
+            inbound = SMSService.save_inbound(from_number, message_body)
+            twiml = _reply(from_number, message_body, message_sid, inbound.id, categories)
         except Exception as e:
             current_app.logger.error(f"Request {g.request_id} processing error: {str(e)}")
             raise APIError("Failed to process message")
         
-        # Create response
-        resp = MessagingResponse()
-        resp.message(response_text)
         current_app.logger.info(f"Request {g.request_id} completed successfully")
-        return str(resp)
+        return twiml
         
     except (ValidationError, APIError, DatabaseError) as e:
+        if message_sid and not isinstance(e, ValidationError):
+            # Allow a retry of a message that failed to be processed again
+            SMSService.release_message(message_sid)
         # Let these propagate to global handler
         raise
     except Exception as e:
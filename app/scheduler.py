@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from flask import current_app
+
+class _Job:
+    """A function run every `interval` seconds"""
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = time.monotonic() + interval
+
+class _SchedulerState:
+    """Jobs and worker thread for a single application"""
+    def __init__(self):
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.pid = None
+        self.thread = None
+
+class Scheduler:
+    """Runs periodic maintenance jobs on a background thread in each worker.
+
+    Jobs are registered while the app is created and the thread is started
+    lazily on the first request handled by each process, so it survives
+    gunicorn forking workers after the app has been imported.
+    """
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach a job list to the application"""
+        app.extensions['scheduler'] = _SchedulerState()
+
+        @app.before_request
+        def start_scheduler():
+            self.start()
+
+    def add_job(self, app, name, interval, func):
+        """Run func inside an app context every `interval` seconds"""
+        if interval <= 0:
+            return
+        app.extensions['scheduler'].jobs.append(_Job(name, interval, func))
+
+    def start(self):
+        """Start the worker thread for this process if it is not running"""
+        state = current_app.extensions['scheduler']
+        if not state.jobs or state.pid == os.getpid():
+            return
+        with state.lock:
+            if state.pid == os.getpid():
+                return
+            state.pid = os.getpid()
+            state.thread = threading.Thread(
+                target=self._run,
+                args=(current_app._get_current_object(), state),
+                name='scheduler',
+                daemon=True
+            )
+            state.thread.start()
+
+    def _run(self, app, state):
+        while True:
+            now = time.monotonic()
+            for job in state.jobs:
+                if job.next_run > now:
+                    continue
+                job.next_run = now + job.interval
+                with app.app_context():
+                    try:
+                        job.func()
+                    except Exception as e:
+                        app.logger.error(f"Scheduled job {job.name} failed: {str(e)}")
+            next_run = min(job.next_run for job in state.jobs)
+            time.sleep(max(next_run - time.monotonic(), 1))
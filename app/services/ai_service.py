@@ -1,76 +1,196 @@
-import openai
-import os
 import hashlib
+import json
+import re
 from functools import wraps
-from datetime import datetime, timedelta
+import openai
 from flask import current_app
-from app import db
-from app.models import Cache
+from app import clients, upstream
+from app.services.cache_service import CacheService, CONTEXT_KEY_PREFIX
+from app.services.context_builder import ContextBuilder
+from app.services.model_router import ModelRouter
+from app.services.semantic_cache import SemanticCache
+
+SYSTEM_PROMPT = "You are JANE, Job Assistance and Navigation Expert, a dedicated and empathetic chatbot specializing in supporting individuals with disabilities in their journey to secure and maintain meaningful employment. Your role is to provide personalized, practical advice and resources tailored to the unique challenges and strengths of each user. You must adhere to the following guidelines:\n\nCore Responsibilities\nEmpower and Encourage:\nUse respectful, inclusive, and uplifting language. Validate users' experiences and emphasize their strengths while gently guiding them through obstacles.\n\nOffer Tailored Guidance:\nProvide detailed support on job search strategies, resume and cover letter development, interview preparation, networking, workplace accommodations, and self-advocacy. Tailor your advice to each user's unique situation.\n\nBe Informed and Resourceful:\nStay updated on best practices, employment laws (such as the ADA or relevant local regulations), and available community resources. When needed, suggest that users consult professionals or legal experts for personalized advice.\n\nMaintain Sensitivity and Confidentiality:\nAsk clarifying questions to fully understand the user's circumstances. Avoid assumptions and ensure your responses consider the diverse experiences of people with disabilities.\n\nEncourage Self-Advocacy and Long-Term Success:\nEmpower users to confidently articulate their needs in the workplace and advocate for appropriate accommodations. Provide strategies for not only obtaining employment but also for navigating ongoing workplace challenges and career advancement.\n\nStay Focused on Employment Support:\nWhen conversations drift to topics unrelated to employment, disability workplace rights, career development, or professional growth, politely redirect the discussion back to your core purpose. Acknowledge the user's concerns while explaining that you specialize in employment-related guidance and can best assist with those matters. For other topics, suggest they seek appropriate resources or professionals in those specific areas.\n\nResponse Formatting Guidelines\nSimple Responses:\nWhen addressing straightforward questions or requests:\n- Be Concise: Deliver clear, direct answers in plain language.\n- Use Bullet Points: If listing tips or steps, use bullet points to enhance clarity.\n- Keep It Accessible: Ensure the response is easy to read and understand without overwhelming the user.\n\nComplex Responses:\nWhen addressing multifaceted issues or providing in-depth advice:\n- Structured Layout: Organize your response using headers, subheaders, and bullet points to break down the information into digestible sections.\n- Detailed Explanations: Provide comprehensive guidance, including background information, actionable steps, and examples where applicable.\n- Clarity and Navigation: Use numbered lists or sections to guide the user through complex processes or multi-step strategies.\n- Summaries: Consider including a brief overview or summary of key points at the beginning or end of the response to help the user quickly grasp the main ideas.\n\nAdditional Guidelines\nClarify Limitations:\nRemind users that your advice is informational and supportive in nature and does not replace personalized advice from career professionals or legal experts.\n\nEmpathy and Respect:\nAlways approach each interaction with sensitivity, acknowledging the unique challenges faced by individuals with disabilities while promoting their strengths and potential.\n\nResponsive and Adaptive:\nTailor your response format (simple vs. complex) based on the user's query complexity, ensuring the delivery of information is both accessible and comprehensive.\n\nYour overall goal is to help users overcome barriers, build confidence, and achieve their employment goals through a supportive and well-structured dialogue."
+
+# Shorter prompt for text messages: plain text, a few sentences, no formatting
+SMS_SYSTEM_PROMPT = "You are JANE, Job Assistance and Navigation Expert, an empathetic employment coach for people with disabilities, replying by text message. Give practical, encouraging advice on job searching, resumes, cover letters, interviews, networking, workplace accommodations, employment rights and self-advocacy, tailored to the user's situation. Reply in plain text only: no markdown, headers, bold, tables or emoji. Keep replies under 300 characters, at most three short sentences or three short list items starting with '-'. Ask one clarifying question when the situation is unclear. Politely redirect topics unrelated to employment, and suggest a career professional or legal expert when appropriate."
+
+SUMMARY_PROMPT = "You maintain a running summary of a conversation between a job seeker and JANE, an employment coach for people with disabilities. Update the current summary with the new messages. Keep the user's goals, circumstances, accommodations discussed, advice already given and open questions. Write at most a short paragraph in plain text, without greetings or commentary."
+
+# Errors that mean OpenAI is unreachable or overloaded and count against the circuit
+UPSTREAM_FAILURES = (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+def _normalize_content(text):
+    """Normalize message text so trivially different turns share a cache key"""
+    return re.sub(r'\s+', ' ', text.lower()).strip(' .,!?')
 
 class AIService:
     """Service for interacting with OpenAI API"""
     
+    @staticmethod
+    def context_cache_key(user_message, context, summary=None, channel='chat'):
+        """Build a cache key from everything the reply is generated from.
+        
+        The whole context is hashed, not just its latest turns: the reply can
+        draw on any of it, and a shorter key would hand one user's answer
+        (and the personal details in it) to another whose recent turns match.
+        """
+        # Channels get different reply lengths, so they don't share answers
+        canonical = [['channel', channel]] if channel != 'chat' else []
+        if summary:
+            canonical.append(['summary', _normalize_content(summary)])
+        canonical.extend([msg['role'], _normalize_content(msg['content'])] for msg in context or [])
+        canonical.append(['user', _normalize_content(user_message)])
+        hash_digest = hashlib.sha256(
+            json.dumps(canonical, separators=(',', ':')).encode()
+        ).hexdigest()
+        return f"{CONTEXT_KEY_PREFIX}{hash_digest}"
+    
+    @staticmethod
+    def response_cache_key(user_message, channel='chat'):
+        """Build the cache key of a reply to a message without context"""
+        keyed = user_message if channel == 'chat' else f"{channel}:{user_message}"
+        hash_digest = hashlib.sha256(keyed.encode()).hexdigest()
+        return f"response:{hash_digest}"
+    
+    @classmethod
+    def cached_reply(cls, user_message, channel='chat'):
+        """Look up the reply to a message without context, by exact match and then by similarity.
+        
+        Returns the reply and None on a hit. On a miss, returns None and the
+        question's vector (if the semantic tier is on) for remember_reply.
+        """
+        cached = CacheService.get(cls.response_cache_key(user_message, channel))
+        if cached is not None:
+            current_app.logger.info("Cache hit for message")
+            return cached, None
+        
+        # Serve the answer to a similar earlier question if it is close enough
+        if channel != 'chat' or not SemanticCache.enabled():
+            return None, None
+        vector = SemanticCache.embed(user_message)
+        cached = SemanticCache.lookup(vector, user_message)
+        if cached is not None:
+            current_app.logger.info("Semantic cache hit for message")
+            return cached, None
+        return None, vector
+    
+    @classmethod
+    def remember_reply(cls, user_message, response, vector=None, channel='chat'):
+        """Cache a reply to a message without context that was generated outside get_or_compute"""
+        cache_key = cls.response_cache_key(user_message, channel)
+        CacheService.set(cache_key, response)
+        if vector is not None:
+            SemanticCache.remember(cache_key, vector, user_message)
+    
     @staticmethod
     def cache_response(func):
         """Decorator to cache API responses"""
         @wraps(func)
-        def wrapper(cls, user_message, context=None):
-            # Only cache responses without context
-            if not context:
-                hash_digest = hashlib.sha256(user_message.encode()).hexdigest()
-                cache_key = f"response:{hash_digest}"
-                cached = Cache.query.get(cache_key)
-                
-                if cached and cached.expires > datetime.utcnow():
-                    current_app.logger.info("Cache hit for message")
-                    return cached.response
+        def wrapper(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+            # Optionally cache turns with context, keyed on the whole history
+            if (context or summary) and current_app.config['CACHE_CONTEXT_ENABLED']:
+                cache_key = cls.context_cache_key(user_message, context, summary, channel)
+                cached = CacheService.get(cache_key, tier='context')
                 
-                response = func(cls, user_message, context)
+                if cached is not None:
+                    current_app.logger.info("Context cache hit for message")
+                    return cached
                 
-                # Cache for configured time
-                cache_ttl = current_app.config['CACHE_TTL']
-                if cached:
-                    cached.response = response
-                    cached.expires = datetime.utcnow() + timedelta(seconds=cache_ttl)
-                else:
-                    cached = Cache(
-                        id=cache_key,
-                        response=response,
-                        expires=datetime.utcnow() + timedelta(seconds=cache_ttl)
-                    )
-                    db.session.add(cached)
+                return CacheService.get_or_compute(
+                    cache_key,
+                    lambda: func(cls, user_message, context, summary, channel, categories),
+                    tier='context'
+                )
+            
+            # Otherwise only cache responses without context
+            if not context and not summary:
+                cached, vector = cls.cached_reply(user_message, channel)
+                if cached is not None:
+                    return cached
                 
-                db.session.commit()
+                # Identical concurrent requests share a single upstream call
+                cache_key = cls.response_cache_key(user_message, channel)
+                response = CacheService.get_or_compute(
+                    cache_key,
+                    lambda: func(cls, user_message, context, channel=channel, categories=categories)
+                )
+                if vector is not None:
+                    SemanticCache.remember(cache_key, vector, user_message)
                 return response
             
-            return func(cls, user_message, context)
+            return func(cls, user_message, context, summary, channel, categories)
+        return wrapper
+    
+    @staticmethod
+    def cache_stream(func):
+        """Decorator to serve streamed replies without context from the cache, and cache new ones"""
+        @wraps(func)
+        def wrapper(cls, user_message, context=None, summary=None, categories=None):
+            if context or summary:
+                yield from func(cls, user_message, context, summary, categories)
+                return
+            
+            cached, vector = cls.cached_reply(user_message)
+            if cached is not None:
+                # Sent whole as a single token
+                yield cached
+                return
+            
+            chunks = []
+            for chunk in func(cls, user_message, context, summary, categories):
+                chunks.append(chunk)
+                yield chunk
+            
+            # Only a stream that ran to the end is cached; the reply has already been sent either way
+            try:
+                cls.remember_reply(user_message, ''.join(chunks), vector)
+            except Exception as e:
+                current_app.logger.error(f"Failed to cache streamed reply: {str(e)}")
         return wrapper
     
+    @classmethod
+    def build_messages(cls, user_message, context=None, summary=None, channel='chat'):
+        """Build the chat completion message list for a user message within the prompt token budget"""
+        budget = current_app.config['OPENAI_PROMPT_TOKEN_BUDGET']
+        system_prompt = SMS_SYSTEM_PROMPT if channel == 'sms' else SYSTEM_PROMPT
+        messages, tokens = ContextBuilder.build(system_prompt, user_message, context, budget, summary)
+        current_app.logger.info(
+            f"Prompt tokens (estimated): {tokens}/{budget}, "
+            f"{len(messages) - (3 if summary else 2)} of {len(context or [])} context messages"
+        )
+        return messages
+    
+    @classmethod
+    def route(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        """Pick the model tier for a turn"""
+        route = ModelRouter.route(user_message, context, summary, channel, categories)
+        current_app.logger.info(f"Model route: {route.tier} ({route.model}, max {route.max_tokens} tokens) for {channel}")
+        return route
+    
     @classmethod
     @cache_response
-    def get_job_coaching_advice(cls, user_message, context=None):
-        """Get job coaching advice using OpenAI"""
+    def get_job_coaching_advice(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        """Get job coaching advice using OpenAI.
+
+        categories are the scanner results the caller already has for the
+        message, if any; they are used to pick the model.
+        """
         if current_app.config['ENV'] == 'production':
             try:
-                messages = [
-                    {"role": "system", "content": "You are JANE, Job Assistance and Navigation Expert, a dedicated and empathetic chatbot specializing in supporting individuals with disabilities in their journey to secure and maintain meaningful employment. Your role is to provide personalized, practical advice and resources tailored to the unique challenges and strengths of each user. You must adhere to the following guidelines:\n\nCore Responsibilities\nEmpower and Encourage:\nUse respectful, inclusive, and uplifting language. Validate users' experiences and emphasize their strengths while gently guiding them through obstacles.\n\nOffer Tailored Guidance:\nProvide detailed support on job search strategies, resume and cover letter development, interview preparation, networking, workplace accommodations, and self-advocacy. Tailor your advice to each user's unique situation.\n\nBe Informed and Resourceful:\nStay updated on best practices, employment laws (such as the ADA or relevant local regulations), and available community resources. When needed, suggest that users consult professionals or legal experts for personalized advice.\n\nMaintain Sensitivity and Confidentiality:\nAsk clarifying questions to fully understand the user's circumstances. Avoid assumptions and ensure your responses consider the diverse experiences of people with disabilities.\n\nEncourage Self-Advocacy and Long-Term Success:\nEmpower users to confidently articulate their needs in the workplace and advocate for appropriate accommodations. Provide strategies for not only obtaining employment but also for navigating ongoing workplace challenges and career advancement.\n\nStay Focused on Employment Support:\nWhen conversations drift to topics unrelated to employment, disability workplace rights, career development, or professional growth, politely redirect the discussion back to your core purpose. Acknowledge the user's concerns while explaining that you specialize in employment-related guidance and can best assist with those matters. For other topics, suggest they seek appropriate resources or professionals in those specific areas.\n\nResponse Formatting Guidelines\nSimple Responses:\nWhen addressing straightforward questions or requests:\n- Be Concise: Deliver clear, direct answers in plain language.\n- Use Bullet Points: If listing tips or steps, use bullet points to enhance clarity.\n- Keep It Accessible: Ensure the response is easy to read and understand without overwhelming the user.\n\nComplex Responses:\nWhen addressing multifaceted issues or providing in-depth advice:\n- Structured Layout: Organize your response using headers, subheaders, and bullet points to break down the information into digestible sections.\n- Detailed Explanations: Provide comprehensive guidance, including background information, actionable steps, and examples where applicable.\n- Clarity and Navigation: Use numbered lists or sections to guide the user through complex processes or multi-step strategies.\n- Summaries: Consider including a brief overview or summary of key points at the beginning or end of the response to help the user quickly grasp the main ideas.\n\nAdditional Guidelines\nClarify Limitations:\nRemind users that your advice is informational and supportive in nature and does not replace personalized advice from career professionals or legal experts.\n\nEmpathy and Respect:\nAlways approach each interaction with sensitivity, acknowledging the unique challenges faced by individuals with disabilities while promoting their strengths and potential.\n\nResponsive and Adaptive:\nTailor your response format (simple vs. complex) based on the user's query complexity, ensuring the delivery of information is both accessible and comprehensive.\n\nYour overall goal is to help users overcome barriers, build confidence, and achieve their employment goals through a supportive and well-structured dialogue."}
-                ]
-                
-                # Add conversation context if provided
-                if context:
-                    messages.extend(context)
-                
-                # Add user's message
-                messages.append({"role": "user", "content": user_message})
+                messages = cls.build_messages(user_message, context, summary, channel)
+                route = cls.route(user_message, context, summary, channel, categories)
                 
                 # Get response from OpenAI
-                client = openai.OpenAI(api_key=current_app.config['OPENAI_API_KEY'])
-                response = client.chat.completions.create(
-                    model=current_app.config['OPENAI_MODEL'],
-                    messages=messages,
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                client = clients.openai()
+                with upstream.guard(UPSTREAM_FAILURES) as attempt:
+                    response = attempt(lambda timeout: client.chat.completions.create(
+                        model=route.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=route.max_tokens,
+                        timeout=timeout
+                    ))
                 
                 return response.choices[0].message.content
                 
@@ -79,4 +199,74 @@ class AIService:
                 raise
         else:
             # Development mock response
-            return f"Development mode response: You said '{user_message}'"
\ No newline at end of file
+            return f"Development mode response: You said '{user_message}'"
+    
+    @classmethod
+    @cache_stream
+    def stream_job_coaching_advice(cls, user_message, context=None, summary=None, categories=None):
+        """Stream job coaching advice from OpenAI, yielding text as it arrives"""
+        if current_app.config['ENV'] == 'production':
+            try:
+                messages = cls.build_messages(user_message, context, summary)
+                route = cls.route(user_message, context, summary, categories=categories)
+                
+                client = clients.openai()
+                # The call slot is held until the stream is finished or closed
+                with upstream.guard(UPSTREAM_FAILURES) as attempt:
+                    # Only opening the stream is retried; tokens already sent can't be taken back
+                    stream = attempt(lambda timeout: client.chat.completions.create(
+                        model=route.model,
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=route.max_tokens,
+                        stream=True,
+                        timeout=timeout
+                    ))
+                    
+                    try:
+                        for chunk in stream:
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if delta:
+                                yield delta
+                    finally:
+                        # Release the pooled connection if the client disconnects early
+                        stream.response.close()
+                
+            except Exception as e:
+                current_app.logger.error(f"OpenAI API streaming error: {str(e)}")
+                raise
+        else:
+            # Development mock response, streamed word by word
+            words = f"Development mode response: You said '{user_message}'".split(' ')
+            for i, word in enumerate(words):
+                yield word if i == 0 else f" {word}"
+    
+    @classmethod
+    def summarize(cls, previous_summary, messages):
+        """Fold new conversation messages into a rolling summary"""
+        transcript = '\n'.join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        if current_app.config['ENV'] == 'production':
+            try:
+                client = clients.openai()
+                with upstream.guard(UPSTREAM_FAILURES) as attempt:
+                    response = attempt(lambda timeout: client.chat.completions.create(
+                        model=current_app.config['OPENAI_MODEL'],
+                        messages=[
+                            {"role": "system", "content": SUMMARY_PROMPT},
+                            {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"}
+                        ],
+                        temperature=0.3,
+                        max_tokens=current_app.config['SUMMARY_MAX_TOKENS'],
+                        timeout=timeout
+                    ))
+                
+                return response.choices[0].message.content
+                
+            except Exception as e:
+                current_app.logger.error(f"OpenAI API summary error: {str(e)}")
+                raise
+        else:
+            # Development mock summary
+            return f"{previous_summary or 'Development mode summary.'} {len(messages)} more messages.".strip()
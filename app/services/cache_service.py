@@ -0,0 +1,406 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Cache, WorkerStats
+
+# Cache ids of responses keyed on conversation context
+CONTEXT_KEY_PREFIX = 'response:ctx:'
+
+# Cache ids of single-flight leases, held while a worker computes a key
+LEASE_KEY_PREFIX = 'lease:'
+
+def _add_counters(total, stats):
+    """Add nested integer counters into total; other values keep the first one seen"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _add_counters(total.setdefault(key, {}), value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            total[key] = total.get(key, 0) + value
+        else:
+            total.setdefault(key, value)
+
+class LRUCache:
+    """Thread-safe, size-bounded in-memory cache with per-entry TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Get a value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a value if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all values"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get size and hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+class _Call:
+    """An in-flight computation that other callers can wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into a single execution"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """Run func once for all concurrent callers using the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class CacheService:
+    """Two-tier response cache: a per-worker LRU in front of the cache table"""
+
+    # Config keys for the in-memory size and TTL of each tier
+    TIERS = {
+        'response': ('CACHE_LRU_SIZE', 'CACHE_TTL'),
+        'context': ('CACHE_CONTEXT_LRU_SIZE', 'CACHE_CONTEXT_TTL')
+    }
+
+    @classmethod
+    def _local(cls, tier='response'):
+        """Get the in-process cache of a tier for the current application"""
+        caches = current_app.extensions.setdefault('response_cache', {})
+        cache = caches.get(tier)
+        if cache is None:
+            size_key, ttl_key = cls.TIERS[tier]
+            cache = caches.setdefault(tier, LRUCache(
+                current_app.config[size_key],
+                current_app.config[ttl_key]
+            ))
+        return cache
+
+    @classmethod
+    def ttl(cls, tier='response'):
+        """Get the configured TTL of a tier in seconds"""
+        return current_app.config[cls.TIERS[tier][1]]
+
+    @classmethod
+    def _flights(cls):
+        """Get the in-flight call table for the current application"""
+        flights = current_app.extensions.get('response_flights')
+        if flights is None:
+            flights = current_app.extensions.setdefault('response_flights', SingleFlight())
+        return flights
+
+    @classmethod
+    def get(cls, key, tier='response'):
+        """Get a cached response, checking memory before the database"""
+        local = cls._local(tier)
+        response = local.get(key)
+        if response is not None:
+            return response
+
+        cached = db.session.get(Cache, key)
+        now = datetime.utcnow()
+        if cached and cached.expires > now:
+            # Promote to the memory tier for the rest of its lifetime
+            local.set(key, cached.response, ttl=(cached.expires - now).total_seconds())
+            return cached.response
+        return None
+
+    @classmethod
+    def set(cls, key, response, tier='response'):
+        """Store a response in memory and in the database"""
+        ttl = cls.ttl(tier)
+        cls._local(tier).set(key, response, ttl=ttl)
+
+        try:
+            db.session.merge(Cache(
+                id=key,
+                response=response,
+                expires=datetime.utcnow() + timedelta(seconds=ttl)
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def get_or_compute(cls, key, compute, tier='response'):
+        """Compute a response the caller just missed in the cache, once for all concurrent callers.
+
+        Identical requests in this worker wait on the first caller and share
+        its result. When CACHE_SINGLE_FLIGHT_LEASE is set, a lease row in the
+        cache table also makes other workers wait for the result instead of
+        computing it.
+        """
+        return cls._flights().do(key, lambda: cls._compute(key, compute, tier))
+
+    @classmethod
+    def _compute(cls, key, compute, tier):
+        lease_ttl = current_app.config['CACHE_SINGLE_FLIGHT_LEASE']
+        leased = lease_ttl > 0 and cls._acquire_lease(key, lease_ttl)
+        if lease_ttl > 0 and not leased:
+            response = cls._wait_for_lease(key, lease_ttl, tier)
+            if response is not None:
+                return response
+
+        try:
+            if leased:
+                # Another worker may have stored it and released its lease since our miss
+                response = cls.get(key, tier)
+                if response is not None:
+                    return response
+            response = compute()
+            cls.set(key, response, tier)
+            return response
+        finally:
+            if leased:
+                cls._release_lease(key)
+
+    @classmethod
+    def _acquire_lease(cls, key, ttl):
+        """Claim the right to compute a key across workers"""
+        lease_id = f"{LEASE_KEY_PREFIX}{key}"
+        now = datetime.utcnow()
+        try:
+            # Take over a lease abandoned by a worker that died mid-call
+            Cache.query\
+                .filter(Cache.id == lease_id, Cache.expires < now)\
+                .delete(synchronize_session=False)
+            db.session.add(Cache(id=lease_id, response='', expires=now + timedelta(seconds=ttl)))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    @classmethod
+    def _wait_for_lease(cls, key, ttl, tier):
+        """Poll for the leaseholder's result until the lease is released or expires"""
+        lease_id = f"{LEASE_KEY_PREFIX}{key}"
+        interval = current_app.config['CACHE_SINGLE_FLIGHT_POLL_INTERVAL']
+        deadline = time.monotonic() + ttl
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            response = cls.get(key, tier)
+            if response is not None:
+                return response
+            held = db.session.query(Cache.id).filter(Cache.id == lease_id).first()
+            if held is None:
+                return cls.get(key, tier)
+        return None
+
+    @classmethod
+    def _release_lease(cls, key):
+        try:
+            Cache.query.filter(Cache.id == f"{LEASE_KEY_PREFIX}{key}").delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to release cache lease: {str(e)}")
+
+    @classmethod
+    def clear(cls):
+        """Clear memory and database; the database delete is committed by the caller"""
+        for tier in cls.TIERS:
+            cls._local(tier).clear()
+        Cache.query.delete()
+
+    @classmethod
+    def purge_expired(cls, batch_size=None):
+        """Delete expired rows in bounded chunks, returning the number deleted"""
+        batch_size = batch_size or current_app.config['CACHE_SWEEP_BATCH_SIZE']
+        now = datetime.utcnow()
+        total = 0
+        while True:
+            expired = db.session.query(Cache.id)\
+                .filter(Cache.expires < now)\
+                .limit(batch_size)\
+                .scalar_subquery()
+            deleted = cls._delete_chunk(expired)
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+    @classmethod
+    def enforce_max_rows(cls, max_rows=None, batch_size=None, prefix=None):
+        """Evict the oldest rows of a tier until at most max_rows remain.
+
+        With a prefix, only ids under it are counted and evicted; without
+        one, the response tier is (every row outside the context tier).
+        """
+        max_rows = current_app.config['CACHE_MAX_ROWS'] if max_rows is None else max_rows
+        batch_size = batch_size or current_app.config['CACHE_SWEEP_BATCH_SIZE']
+        if max_rows <= 0:
+            return 0
+
+        rows = Cache.query
+        if prefix:
+            rows = rows.filter(Cache.id.startswith(prefix))
+        else:
+            # The context tier has its own TTL and cap
+            rows = rows.filter(~Cache.id.startswith(CONTEXT_KEY_PREFIX))
+        # Evicting a held lease would let another worker compute the same key
+        rows = rows.filter(~Cache.id.startswith(LEASE_KEY_PREFIX))
+        excess = rows.count() - max_rows
+        total = 0
+        while excess > 0:
+            # Rows of a tier share a TTL, so the earliest expiry is the oldest write
+            oldest = rows.with_entities(Cache.id)\
+                .order_by(Cache.expires.asc())\
+                .limit(min(excess, batch_size))\
+                .scalar_subquery()
+            deleted = cls._delete_chunk(oldest)
+            if not deleted:
+                break
+            total += deleted
+            excess -= deleted
+        return total
+
+    @classmethod
+    def sweep(cls, batch_size=None, max_rows=None):
+        """Purge expired rows, then trim each tier to its maximum size"""
+        expired = cls.purge_expired(batch_size)
+        evicted = cls.enforce_max_rows(
+            current_app.config['CACHE_CONTEXT_MAX_ROWS'],
+            batch_size,
+            prefix=CONTEXT_KEY_PREFIX
+        )
+        evicted += cls.enforce_max_rows(max_rows, batch_size)
+        if expired or evicted:
+            current_app.logger.info(f"Cache sweep removed {expired} expired and {evicted} evicted rows")
+        return {'expired': expired, 'evicted': evicted}
+
+    @classmethod
+    def _delete_chunk(cls, ids):
+        """Delete the rows selected by an id subquery in one transaction"""
+        try:
+            deleted = Cache.query\
+                .filter(Cache.id.in_(ids))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            return deleted
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @classmethod
+    def stats(cls):
+        """Get counters for the in-process caches of this worker"""
+        stats = {tier: cls._local(tier).stats() for tier in cls.TIERS}
+        stats['coalesced'] = cls._flights().coalesced
+        return stats
+    
+    @classmethod
+    def publish_stats(cls):
+        """Store this worker's counters so `flask cache stats` can read them from another process"""
+        # Imported here because the semantic tier is built on this service
+        from app.services.semantic_cache import SemanticCache
+        stats = cls.stats()
+        if SemanticCache.enabled():
+            stats['semantic'] = SemanticCache.stats()
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        current_app.logger.info(f"Cache stats for {worker}: {json.dumps(stats)}")
+        try:
+            row = db.session.get(WorkerStats, worker)
+            if row is None:
+                db.session.add(WorkerStats(worker=worker, stats=json.dumps(stats)))
+            else:
+                row.stats = json.dumps(stats)
+                row.updated_at = datetime.utcnow()
+            # Workers that stopped publishing have exited or restarted
+            WorkerStats.query\
+                .filter(WorkerStats.updated_at < datetime.utcnow() - timedelta(days=1))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @classmethod
+    def worker_stats(cls, max_age):
+        """Get the counters published by each worker in the last max_age seconds, and their totals"""
+        rows = WorkerStats.query\
+            .filter(WorkerStats.updated_at >= datetime.utcnow() - timedelta(seconds=max_age))\
+            .order_by(WorkerStats.worker)\
+            .all()
+        workers = {row.worker: json.loads(row.stats) for row in rows}
+        total = {}
+        for stats in workers.values():
+            _add_counters(total, stats)
+        return {'total': total, 'workers': workers}
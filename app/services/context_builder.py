@@ -0,0 +1,72 @@
+import math
+
+# Tokens the chat format adds around each message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+# Don't bother keeping a truncated turn smaller than this
+MIN_TRUNCATED_TOKENS = 32
+
+TRUNCATION_MARKER = '…'
+
+# Roles a history message may have
+CONTEXT_ROLES = ('user', 'assistant')
+
+def estimate_tokens(text):
+    """Estimate the token count of text (about 4 characters per token for English)"""
+    return math.ceil(len(text) / 4)
+
+class ContextBuilder:
+    """Fits the system prompt, conversation history and new message into a token budget"""
+
+    @classmethod
+    def clean(cls, context):
+        """Keep only the context items that are messages with a known role and text content.
+
+        Chat context is sent by the client, so malformed items are skipped
+        rather than failing the request.
+        """
+        if not isinstance(context, list):
+            return []
+        return [
+            {'role': item['role'], 'content': item['content']}
+            for item in context
+            if isinstance(item, dict) and item.get('role') in CONTEXT_ROLES and isinstance(item.get('content'), str)
+        ]
+
+    @classmethod
+    def build(cls, system_prompt, user_message, context=None, budget=None, summary=None):
+        """Build the chat message list, dropping or truncating the oldest turns first.
+
+        The system prompt, conversation summary (if any) and new message are
+        always sent. History is added newest first while it fits; the first
+        turn that does not fit is cut down to the remaining budget (if enough
+        is left) and older turns are dropped. Returns the messages and the
+        estimated prompt tokens.
+        """
+        preamble = [{"role": "system", "content": system_prompt}]
+        if summary:
+            preamble.append({"role": "system", "content": f"Summary of the conversation so far:\n{summary}"})
+        used = sum(estimate_tokens(message['content']) + MESSAGE_OVERHEAD for message in preamble)
+        used += estimate_tokens(user_message) + MESSAGE_OVERHEAD
+        remaining = budget - used if budget else math.inf
+
+        history = []
+        for message in reversed(cls.clean(context)):
+            cost = estimate_tokens(message['content']) + MESSAGE_OVERHEAD
+            if cost <= remaining:
+                history.append(message)
+                remaining -= cost
+                used += cost
+                continue
+
+            available = remaining - MESSAGE_OVERHEAD
+            if available >= MIN_TRUNCATED_TOKENS:
+                content = message['content'][:available * 4 - len(TRUNCATION_MARKER)] + TRUNCATION_MARKER
+                history.append({'role': message['role'], 'content': content})
+                used += estimate_tokens(content) + MESSAGE_OVERHEAD
+            break
+
+        messages = preamble
+        messages.extend(reversed(history))
+        messages.append({"role": "user", "content": user_message})
+        return messages, used
@@ -1,7 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from flask import current_app
+from sqlalchemy import func, or_, and_, insert
+from sqlalchemy.exc import IntegrityError
 from app import db
-from app.models import Message, Cache
+from app.exceptions import ValidationError
+from app.models import Message, Conversation
 from app.services.user_service import UserService
+from app.services.cache_service import CacheService
 
 class MessageService:
     """Service for handling chat message operations"""
@@ -10,40 +15,97 @@ class MessageService:
     def cache_message(cls, message_data, user_id=None, conversation_id=None):
         """Add message to database"""
         try:
-            message = Message(
-                content=message_data['content'],
-                type=message_data['type'],
-                timestamp=datetime.fromisoformat(message_data['timestamp']) 
-                    if isinstance(message_data['timestamp'], str) 
-                    else message_data['timestamp'],
-                user_id=user_id,
-                conversation_id=conversation_id
-            )
+            message = Message(**cls._message_row(message_data, user_id, conversation_id))
             db.session.add(message)
-            
-            # If no conversation ID, use older behavior (keep only last 5 messages)
-            if not conversation_id:
-                # Keep only last 5 messages for anonymous users
-                filter_query = Message.query
-                if user_id:
-                    filter_query = filter_query.filter_by(user_id=user_id)
-                else:
-                    filter_query = filter_query.filter_by(user_id=None)
-                
-                old_messages = filter_query\
-                    .order_by(Message.timestamp.desc())\
-                    .offset(5)\
-                    .all()
-                
-                for msg in old_messages:
-                    db.session.delete(msg)
-            
+            cls._after_insert([message], user_id, conversation_id)
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            raise e
+    
+    @classmethod
+    def record_exchange(cls, user_msg, bot_msg, user_id=None, conversation_id=None):
+        """Add a user message and its reply with a single insert and commit"""
+        try:
+            rows = [
+                cls._message_row(user_msg, user_id, conversation_id),
+                cls._message_row(bot_msg, user_id, conversation_id)
+            ]
+            db.session.execute(insert(Message), rows)
+            cls._after_insert([Message(**row) for row in rows], user_id, conversation_id)
             db.session.commit()
             return True
         except Exception as e:
             db.session.rollback()
             raise e
     
+    @classmethod
+    def _message_row(cls, message_data, user_id, conversation_id):
+        """Get the column values for a message"""
+        timestamp = message_data['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        if timestamp.tzinfo is not None:
+            # Store naive UTC like the column default
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            'content': message_data['content'],
+            'type': message_data['type'],
+            'timestamp': timestamp,
+            'user_id': user_id,
+            'conversation_id': conversation_id
+        }
+    
+    @classmethod
+    def _after_insert(cls, messages, user_id, conversation_id):
+        """Trim history or update the conversation summary for new messages"""
+        # If no conversation ID, use older behavior (keep only the last few messages)
+        if not conversation_id:
+            if current_app.config['HISTORY_TRIM_ON_WRITE']:
+                cls._trim_history(user_id)
+        else:
+            cls._update_conversation(conversation_id, user_id, messages)
+    
+    @classmethod
+    def _trim_history(cls, user_id):
+        """Delete all but the newest messages without a conversation, in one statement"""
+        db.session.flush()
+        surplus = db.session.query(Message.id)\
+            .filter(Message.conversation_id.is_(None))\
+            .filter(Message.user_id == user_id if user_id else Message.user_id.is_(None))\
+            .order_by(Message.timestamp.desc())\
+            .offset(current_app.config['HISTORY_KEEP_MESSAGES'])\
+            .scalar_subquery()
+        Message.query\
+            .filter(Message.id.in_(surplus))\
+            .delete(synchronize_session=False)
+    
+    @classmethod
+    def compact_history(cls):
+        """Trim messages without a conversation for every user at once"""
+        ranked = db.session.query(
+            Message.id.label('id'),
+            func.row_number().over(
+                partition_by=Message.user_id,
+                order_by=Message.timestamp.desc()
+            ).label('position')
+        )\
+            .filter(Message.conversation_id.is_(None))\
+            .subquery()
+        surplus = db.session.query(ranked.c.id)\
+            .filter(ranked.c.position > current_app.config['HISTORY_KEEP_MESSAGES'])\
+            .scalar_subquery()
+        try:
+            deleted = Message.query\
+                .filter(Message.id.in_(surplus))\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            return deleted
+        except Exception:
+            db.session.rollback()
+            raise
+    
     @classmethod
     def clear_history(cls, user_id=None, conversation_id=None):
         """Clear chat messages and cache"""
@@ -57,8 +119,16 @@ class MessageService:
             
             query.delete(synchronize_session=False)
             
+            # Remove summaries of the cleared conversations
+            conversations = Conversation.query
+            if user_id:
+                conversations = conversations.filter_by(user_id=user_id)
+            if conversation_id:
+                conversations = conversations.filter_by(id=conversation_id)
+            conversations.delete(synchronize_session=False)
+            
             # Clear response cache
-            Cache.query.delete()
+            CacheService.clear()
             
             db.session.commit()
             return True
@@ -85,35 +155,132 @@ class MessageService:
         return [msg.to_dict() for msg in reversed(messages)]
     
     @classmethod
-    def get_conversations(cls, user_id):
-        """Get all conversations for a user"""
-        # Get distinct conversation IDs for this user
-        conversations = db.session.query(Message.conversation_id)\
-            .filter_by(user_id=user_id)\
-            .filter(Message.conversation_id.isnot(None))\
-            .distinct()\
+    def get_conversations(cls, user_id, limit=20, before=None):
+        """Get a page of conversations for a user, most recently updated first.
+        
+        Pass the cursor of the last conversation on a page (see
+        conversation_cursor) as `before` to get the next page.
+        """
+        query = Conversation.query.filter_by(user_id=user_id)
+        
+        if before:
+            last_updated, conversation_id = cls._parse_cursor(before)
+            query = query.filter(or_(
+                Conversation.last_updated < last_updated,
+                and_(
+                    Conversation.last_updated == last_updated,
+                    Conversation.id < conversation_id
+                )
+            ))
+        
+        conversations = query\
+            .order_by(Conversation.last_updated.desc(), Conversation.id.desc())\
+            .limit(limit)\
             .all()
         
-        result = []
-        for conv in conversations:
-            conv_id = conv[0]
-            # Get the latest message for this conversation
-            latest_message = Message.query\
-                .filter_by(conversation_id=conv_id)\
-                .order_by(Message.timestamp.desc())\
-                .first()
+        return [conversation.to_dict() for conversation in conversations]
+    
+    @classmethod
+    def check_conversations(cls, fix=False):
+        """Compare conversation summaries with the message table.
+        
+        Returns the IDs of conversations whose summary is missing, stale or
+        orphaned. With fix=True those summaries are rebuilt or removed.
+        """
+        # Rank each conversation's messages newest first and count them in one pass
+        ranked = db.session.query(
+            Message.conversation_id.label('conversation_id'),
+            Message.user_id.label('user_id'),
+            Message.content.label('content'),
+            Message.timestamp.label('timestamp'),
+            func.row_number().over(
+                partition_by=Message.conversation_id,
+                order_by=(Message.timestamp.desc(), Message.id.desc())
+            ).label('position'),
+            func.count().over(partition_by=Message.conversation_id).label('message_count')
+        )\
+            .filter(Message.conversation_id.isnot(None))\
+            .subquery()
+        
+        summaries = {conversation.id: conversation for conversation in Conversation.query.all()}
+        mismatched = []
+        
+        latest_messages = db.session.query(ranked)\
+            .filter(ranked.c.position == 1)\
+            .yield_per(1000)
+        for row in latest_messages:
+            expected = {
+                'user_id': row.user_id,
+                'last_message': Conversation.preview(row.content),
+                'last_updated': row.timestamp,
+                'message_count': row.message_count
+            }
+            conversation = summaries.pop(row.conversation_id, None)
+            if conversation is not None and all(
+                getattr(conversation, key) == value for key, value in expected.items()
+            ):
+                continue
             
-            if latest_message:
-                result.append({
-                    'id': conv_id,
-                    'last_message': latest_message.content[:50] + '...' if len(latest_message.content) > 50 else latest_message.content,
-                    'last_updated': latest_message.timestamp.isoformat(),
-                    'message_count': Message.query.filter_by(conversation_id=conv_id).count()
-                })
+            mismatched.append(row.conversation_id)
+            if fix:
+                if conversation is None:
+                    conversation = Conversation(id=row.conversation_id)
+                    db.session.add(conversation)
+                for key, value in expected.items():
+                    setattr(conversation, key, value)
+        
+        # Anything left has no messages
+        for conversation in summaries.values():
+            mismatched.append(conversation.id)
+            if fix:
+                db.session.delete(conversation)
+        
+        if fix:
+            db.session.commit()
+        return mismatched
+    
+    @classmethod
+    def _update_conversation(cls, conversation_id, user_id, messages):
+        """Fold new messages into their conversation summary in the current transaction"""
+        latest = max(messages, key=lambda message: message.timestamp)
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None:
+            try:
+                # Inserted in a savepoint so losing a race only undoes this row, not the messages
+                with db.session.begin_nested():
+                    db.session.add(Conversation(
+                        id=conversation_id,
+                        user_id=user_id,
+                        last_message=Conversation.preview(latest.content),
+                        last_updated=latest.timestamp,
+                        message_count=len(messages)
+                    ))
+                return
+            except IntegrityError:
+                # A concurrent first message created it; add these messages to its count
+                conversation = db.session.get(Conversation, conversation_id)
+                if conversation is None:
+                    raise
         
-        # Sort by last updated
-        result.sort(key=lambda x: x['last_updated'], reverse=True)
-        return result
+        # Increment in SQL so concurrent writers don't lose counts
+        conversation.message_count = Conversation.message_count + len(messages)
+        if latest.timestamp >= conversation.last_updated:
+            conversation.last_message = Conversation.preview(latest.content)
+            conversation.last_updated = latest.timestamp
+    
+    @classmethod
+    def conversation_cursor(cls, conversation):
+        """Get the pagination cursor for a conversation returned by get_conversations"""
+        return f"{conversation['last_updated']}|{conversation['id']}"
+    
+    @classmethod
+    def _parse_cursor(cls, cursor):
+        """Split a pagination cursor into its timestamp and conversation ID"""
+        try:
+            last_updated, conversation_id = cursor.split('|', 1)
+            return datetime.fromisoformat(last_updated), conversation_id
+        except ValueError:
+            raise ValidationError("Invalid conversation cursor", code="INVALID_CURSOR")
     
     @classmethod
     def start_new_conversation(cls, user_id):
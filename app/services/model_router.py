@@ -0,0 +1,77 @@
+import re
+from collections import namedtuple
+from flask import current_app
+from app.services.context_builder import estimate_tokens
+from app.utils import scanner
+
+LIGHT = 'light'
+FULL = 'full'
+
+Route = namedtuple('Route', ['tier', 'model', 'max_tokens'])
+
+# Whole messages that only acknowledge, greet or answer yes/no
+SIMPLE_TURNS = frozenset([
+    'ok', 'okay', 'k', 'kk', 'yes', 'yeah', 'yep', 'y', 'no', 'nope', 'n', 'sure',
+    'thanks', 'thank you', 'thanks a lot', 'thank you so much', 'thx', 'ty',
+    'got it', 'great', 'cool', 'nice', 'perfect', 'sounds good', 'will do',
+    'hi', 'hello', 'hey', 'bye', 'goodbye', 'good morning', 'good night'
+])
+
+# Topics that always deserve the full model, however briefly they are raised
+COMPLEX_KEYWORDS = re.compile(
+    r'\b(?:resume|cv|cover letter|interview\w*|accommodat\w*|ada|discriminat\w*|'
+    r'rights?|lawyer|legal|salary|negotiat\w*|fired|terminat\w*|disclos\w*|'
+    r'harass\w*|benefits|ssdi|ssi|explain|why|how|compare|plan|strateg\w*)\b'
+)
+
+# Categories flagged by the content scanner that need careful answers
+COMPLEX_CATEGORIES = (scanner.DISABILITY, scanner.HARMFUL)
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', text.lower()).strip(' .,!?:)(')
+
+class ModelRouter:
+    """Picks the model and reply length for a turn.
+
+    Trivial turns ("thanks", "ok", yes/no follow-ups) go to the light tier;
+    questions, long messages, sensitive topics and short follow-ups deep into
+    a conversation (which lean on the history) go to the full tier. Each
+    tier's model and max_tokens come from OPENAI_MODEL_TIERS, and channels
+    such as SMS can override them.
+    """
+
+    @classmethod
+    def classify(cls, user_message, context=None, summary=None, categories=None):
+        """Get the tier for a message and its conversation.
+
+        Pass the scanner categories when the caller already has them, to
+        avoid scanning the message again.
+        """
+        if not current_app.config['MODEL_ROUTING_ENABLED']:
+            return FULL
+
+        text = _normalize(user_message)
+        if text in SIMPLE_TURNS:
+            return LIGHT
+        if estimate_tokens(user_message) > current_app.config['MODEL_ROUTING_LIGHT_MAX_TOKENS']:
+            return FULL
+        if '?' in user_message or COMPLEX_KEYWORDS.search(text):
+            return FULL
+        if categories is None:
+            categories = scanner.classify(user_message)
+        if any(category in categories for category in COMPLEX_CATEGORIES):
+            return FULL
+
+        # A summary means the conversation already outgrew its recent turns
+        depth = len(context or []) + (current_app.config['MODEL_ROUTING_DEPTH'] if summary else 0)
+        if depth >= current_app.config['MODEL_ROUTING_DEPTH']:
+            return FULL
+        return LIGHT
+
+    @classmethod
+    def route(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        """Get the tier, model and max_tokens to use for a turn on a channel"""
+        tier = cls.classify(user_message, context, summary, categories)
+        settings = dict(current_app.config['OPENAI_MODEL_TIERS'][tier])
+        settings.update(current_app.config['OPENAI_CHANNEL_OVERRIDES'].get(channel, {}).get(tier, {}))
+        return Route(tier, settings['model'], settings['max_tokens'])
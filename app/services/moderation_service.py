@@ -0,0 +1,37 @@
+from flask import current_app
+from app import db
+from app.models import Message, SMSContext
+from app.utils import scanner
+
+class ModerationService:
+    """Service for re-screening stored content against the content scanner"""
+
+    # Source name -> model with id and content columns
+    SOURCES = {
+        'messages': Message,
+        'sms': SMSContext
+    }
+
+    @classmethod
+    def rescreen(cls, sources=None, processes=None, batch_size=None):
+        """Classify stored content, yielding (source, id, categories) for each flagged row.
+
+        Rows are streamed in batches of batch_size and classified across
+        `processes` worker processes, so memory stays flat on large tables.
+        """
+        sources = sources or list(cls.SOURCES)
+        processes = current_app.config['MODERATION_PROCESSES'] if processes is None else processes
+        batch_size = batch_size or current_app.config['MODERATION_BATCH_SIZE']
+
+        for source in sources:
+            model = cls.SOURCES[source]
+            rows = db.session.query(model.id, model.content)\
+                .order_by(model.id)\
+                .execution_options(yield_per=batch_size)
+            flagged = scanner.classify_many(
+                ((row.id, row.content) for row in rows),
+                processes=processes,
+                chunk_size=batch_size
+            )
+            for row_id, categories in flagged:
+                yield source, row_id, categories
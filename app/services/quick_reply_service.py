@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import threading
+import time
+from flask import current_app
+from app.models import SMSContext
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+
+def normalize(text):
+    """Reduce a message to lowercase words, so "Thanks!!" and "thanks" match"""
+    return ' '.join(_PUNCTUATION.sub(' ', text.lower()).split())
+
+def compile_intents(data):
+    """Build the phrase -> intent lookup table from the data file contents"""
+    table = {}
+    for intent in data['intents']:
+        for phrase in intent['phrases']:
+            table[normalize(phrase)] = intent
+    return table
+
+class _QuickReplyState:
+    """Compiled intent table for a single application in the current process"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.table = {}
+        self.mtime = None
+        self.checked_at = None
+
+class QuickReplyService:
+    """Canned replies to SMS acknowledgements, greetings and help requests.
+
+    Intents are read from QUICK_REPLIES_FILE and compiled into a lookup of
+    whole-message phrases, so matching costs one dict lookup. The file is
+    checked for changes at most every QUICK_REPLIES_RELOAD_INTERVAL seconds
+    and reloaded without a restart; if it fails to parse, the previous table
+    stays in use.
+    """
+
+    @classmethod
+    def match(cls, message):
+        """Get the intent whose phrase is the whole message, if any"""
+        if not current_app.config['QUICK_REPLIES_ENABLED']:
+            return None
+        return cls._table().get(normalize(message))
+
+    @classmethod
+    def reply_for(cls, phone_number, message):
+        """Get the canned reply to an inbound SMS, or None if the model should answer"""
+        intent = cls.match(message)
+        if intent is None:
+            return None
+
+        # "ok" or "thanks" after a question may be an answer to it
+        if intent.get('skip_after_question'):
+            last = SMSContext.query\
+                .filter_by(phone_number=phone_number, role='assistant')\
+                .order_by(SMSContext.timestamp.desc())\
+                .first()
+            if last is not None and last.content.rstrip().endswith('?'):
+                return None
+
+        current_app.logger.info(f"Quick reply intent: {intent['name']}")
+        return intent['reply']
+
+    @classmethod
+    def _table(cls):
+        state = current_app.extensions.get('quick_replies')
+        if state is None:
+            state = current_app.extensions.setdefault('quick_replies', _QuickReplyState())
+
+        now = time.monotonic()
+        interval = current_app.config['QUICK_REPLIES_RELOAD_INTERVAL']
+        if state.checked_at is None or now - state.checked_at >= interval:
+            with state.lock:
+                if state.checked_at is None or now - state.checked_at >= interval:
+                    cls._reload(state)
+                    state.checked_at = now
+        return state.table
+
+    @classmethod
+    def _reload(cls, state):
+        """Recompile the table if the data file has changed"""
+        path = current_app.config['QUICK_REPLIES_FILE']
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime == state.mtime:
+                return
+            with open(path) as f:
+                state.table = compile_intents(json.load(f))
+            state.mtime = mtime
+            current_app.logger.info(f"Loaded {len(state.table)} quick reply phrases from {path}")
+        except Exception as e:
+            current_app.logger.error(f"Failed to load quick replies from {path}: {str(e)}")
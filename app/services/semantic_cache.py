@@ -0,0 +1,314 @@
+import re
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Cache
+from app.services.cache_service import CacheService
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency; the semantic tier is disabled without it
+    np = None
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+# Words that carry little meaning in a question ("how do I..." vs "how to...")
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'can', 'could', 'do', 'does', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'should', 'the', 'to',
+    'what', 'when', 'with', 'would', 'you', 'your'
+])
+
+# Words that flip the meaning of a question
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'none', 'nor', 'neither', 'nobody', 'nothing', 'non',
+    'cannot', 'without', 'dont', 'doesnt', 'didnt', 'cant', 'wont', 'isnt',
+    'arent', 'wasnt', 'shouldnt', 'wouldnt', 'couldnt'
+])
+
+# Prefixes that negate the word they are attached to (legal/illegal, fair/unfair)
+NEGATING_PREFIXES = ('il', 'im', 'in', 'ir', 'un', 'dis', 'non')
+
+# Words with opposite meanings that share most of their context in a question
+ANTONYMS = frozenset(frozenset(pair) for pair in [
+    ('allowed', 'forbidden'), ('allowed', 'prohibited'), ('required', 'optional'),
+    ('lawful', 'unlawful'), ('before', 'after'), ('more', 'less'), ('increase', 'decrease'),
+    ('accept', 'reject'), ('accept', 'decline'), ('hire', 'fire'), ('hired', 'fired'),
+    ('quit', 'stay'), ('always', 'never'), ('legal', 'illegal')
+])
+
+# Number of buckets in the similarity histogram
+HISTOGRAM_BINS = 20
+
+# Vectors stored within this long before the newest one loaded are read again
+# on refresh, so rows committed late by another worker are not missed
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+def _features(text):
+    """Yield the words, word bigrams and character n-grams of a text"""
+    words = [word for word in _TOKEN.findall(text.lower()) if word not in STOPWORDS]
+    for word in words:
+        yield f"w:{word}"
+        padded = f" {word} "
+        for size in (3, 4):
+            for start in range(len(padded) - size + 1):
+                yield f"c:{padded[start:start + size]}"
+    for first, second in zip(words, words[1:]):
+        yield f"b:{first} {second}"
+
+def _words(text):
+    return set(_TOKEN.findall(text.lower().replace('\u2019', "'")))
+
+def contradicts(question, other):
+    """Check whether two similar questions differ by a negation or by words of opposite meaning.
+
+    Hashed n-grams score "is it legal..." and "is it illegal..." as near
+    duplicates, so the cached answer to one must never be served for the other.
+    """
+    words, other_words = _words(question), _words(other)
+    differing = words ^ other_words
+    for word in differing:
+        if word in NEGATIONS or word.endswith("n't"):
+            return True
+        if any(word.startswith(prefix) and word[len(prefix):] in differing for prefix in NEGATING_PREFIXES):
+            return True
+    return any(
+        frozenset((word, other_word)) in ANTONYMS
+        for word in words - other_words
+        for other_word in other_words - words
+    )
+
+def embed(text, dimensions):
+    """Embed text as a unit vector of hashed n-gram counts"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature in _features(text):
+        digest = zlib.crc32(feature.encode())
+        # The top bit picks a sign so colliding features tend to cancel out
+        vector[digest % dimensions] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+class VectorIndex:
+    """Growable matrix of unit vectors keyed by cache id, searched by cosine similarity.
+
+    Each key can carry a payload (the question it was asked as). With mmap_dir
+    set, vectors live in an anonymous memory-mapped file in that directory
+    instead of the heap, so large indexes can be paged out.
+    """
+    def __init__(self, dimensions, max_entries, mmap_dir=None):
+        self.dimensions = dimensions
+        self.max_entries = max_entries
+        self.mmap_dir = mmap_dir
+        self._lock = threading.Lock()
+        self._vectors = self._allocate(min(64, max_entries))
+        self._keys = []  # Row -> key, or None once removed
+        self._rows = {}  # Key -> row
+        self._payloads = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, key, vector, payload=None):
+        """Add a vector, returning False if the key is already indexed"""
+        with self._lock:
+            if key in self._rows:
+                return False
+            if len(self._keys) == len(self._vectors):
+                self._grow()
+            row = len(self._keys)
+            self._vectors[row] = vector
+            self._keys.append(key)
+            self._rows[key] = row
+            if payload is not None:
+                self._payloads[key] = payload
+            return True
+
+    def payload(self, key):
+        """Get the payload stored with a key, if any"""
+        with self._lock:
+            return self._payloads.get(key)
+
+    def remove(self, key):
+        """Remove a key if present"""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            self._payloads.pop(key, None)
+            if row is not None:
+                self._keys[row] = None
+                self._vectors[row] = 0
+
+    def search(self, vector):
+        """Get the key most similar to a unit vector and its similarity, or (None, 0.0)"""
+        with self._lock:
+            if not self._rows:
+                return None, 0.0
+            scores = self._vectors[:len(self._keys)] @ vector
+            row = int(np.argmax(scores))
+            return self._keys[row], float(scores[row])
+
+    def _allocate(self, capacity):
+        if self.mmap_dir:
+            return np.memmap(
+                tempfile.TemporaryFile(dir=self.mmap_dir),
+                dtype=np.float32,
+                mode='w+',
+                shape=(capacity, self.dimensions)
+            )
+        return np.zeros((capacity, self.dimensions), dtype=np.float32)
+
+    def _grow(self):
+        """Drop removed rows and reallocate, evicting the oldest entries when full"""
+        live = [(key, row) for row, key in enumerate(self._keys) if key is not None]
+        if len(live) >= self.max_entries:
+            keep = int(self.max_entries * 0.9)
+            live = live[len(live) - keep:]
+        capacity = min(max(64, 2 * len(live)), self.max_entries)
+        vectors = self._allocate(capacity)
+        if live:
+            vectors[:len(live)] = self._vectors[[row for _, row in live]]
+        self._vectors = vectors
+        self._keys = [key for key, _ in live]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._payloads = {key: self._payloads[key] for key in self._keys if key in self._payloads}
+
+class _SemanticState:
+    """Index and counters for a single application in the current process"""
+    def __init__(self, index):
+        self.index = index
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.refreshed_at = None
+        self.watermark = None  # Latest Cache.embedded_at loaded from the database
+        self.hits = 0
+        self.misses = 0
+        self.histogram = [0] * HISTOGRAM_BINS
+
+class SemanticCache:
+    """Optional cache tier that answers a question with the cached answer to a similar one.
+
+    Context-free questions are embedded with a hashed n-gram vectorizer and
+    kept in a per-worker vector index. Each vector and question is also
+    stored on its cache row, so workers pick up each other's entries on
+    refresh. An answer is never reused for a question that differs from the
+    cached one by a negation or an opposite word. Requires numpy.
+    """
+
+    @classmethod
+    def enabled(cls):
+        """Check whether the semantic tier is configured and available"""
+        if not current_app.config['SEMANTIC_CACHE_ENABLED']:
+            return False
+        if np is None:
+            if not current_app.extensions.get('semantic_cache_warned'):
+                current_app.extensions['semantic_cache_warned'] = True
+                current_app.logger.warning("SEMANTIC_CACHE_ENABLED is set but numpy is not installed")
+            return False
+        return True
+
+    @classmethod
+    def embed(cls, question):
+        """Embed a question with the configured dimensions"""
+        return embed(question, current_app.config['SEMANTIC_CACHE_DIMENSIONS'])
+
+    @classmethod
+    def lookup(cls, vector, question):
+        """Get the cached response to the most similar question above the threshold"""
+        state = cls._state()
+        cls._refresh(state)
+        key, score = state.index.search(vector)
+
+        response = None
+        if key is not None and score >= current_app.config['SEMANTIC_CACHE_THRESHOLD']:
+            cached_question = state.index.payload(key)
+            # A negated or opposite question needs its own answer, however similar it scores
+            if cached_question is not None and not contradicts(question, cached_question):
+                response = CacheService.get(key)
+                if response is None:
+                    # Expired or evicted since it was indexed
+                    state.index.remove(key)
+
+        with state.lock:
+            state.histogram[min(max(int(score * HISTOGRAM_BINS), 0), HISTOGRAM_BINS - 1)] += 1
+            if response is None:
+                state.misses += 1
+            else:
+                state.hits += 1
+        return response
+
+    @classmethod
+    def remember(cls, key, vector, question):
+        """Index a cached response and store its vector and question for other workers"""
+        if not cls._state().index.add(key, vector, question):
+            return
+        try:
+            Cache.query\
+                .filter_by(id=key)\
+                .update({
+                    'embedding': vector.tobytes(),
+                    'question': question,
+                    'embedded_at': datetime.utcnow()
+                }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to store cache embedding: {str(e)}")
+
+    @classmethod
+    def stats(cls):
+        """Get hit/miss counters and the histogram of best similarities for this worker"""
+        state = cls._state()
+        with state.lock:
+            return {
+                'size': len(state.index),
+                'threshold': current_app.config['SEMANTIC_CACHE_THRESHOLD'],
+                'hits': state.hits,
+                'misses': state.misses,
+                'similarity_histogram': {
+                    f"{bucket / HISTOGRAM_BINS:.2f}": count
+                    for bucket, count in enumerate(state.histogram)
+                }
+            }
+
+    @classmethod
+    def _state(cls):
+        state = current_app.extensions.get('semantic_cache')
+        if state is None:
+            state = current_app.extensions.setdefault('semantic_cache', _SemanticState(VectorIndex(
+                current_app.config['SEMANTIC_CACHE_DIMENSIONS'],
+                current_app.config['SEMANTIC_CACHE_MAX_ENTRIES'],
+                current_app.config['SEMANTIC_CACHE_MMAP_DIR'] or None
+            )))
+        return state
+
+    @classmethod
+    def _refresh(cls, state):
+        """Load vectors stored by other workers since the last refresh"""
+        interval = current_app.config['SEMANTIC_CACHE_REFRESH_INTERVAL']
+        now = time.monotonic()
+        if state.refreshed_at is not None and now - state.refreshed_at < interval:
+            return
+        if not state.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            state.refreshed_at = now
+            rows = db.session.query(Cache.id, Cache.embedding, Cache.question, Cache.embedded_at)\
+                .filter(Cache.embedding.isnot(None), Cache.question.isnot(None))\
+                .filter(Cache.expires > datetime.utcnow())
+            if state.watermark is not None:
+                # Keys already indexed are skipped by add()
+                rows = rows.filter(Cache.embedded_at >= state.watermark - REFRESH_OVERLAP)
+            rows = rows.order_by(Cache.embedded_at).execution_options(yield_per=500)
+            for row in rows:
+                vector = np.frombuffer(row.embedding, dtype=np.float32)
+                if vector.shape[0] == state.index.dimensions:
+                    state.index.add(row.id, vector, row.question)
+                if row.embedded_at is not None and (state.watermark is None or row.embedded_at > state.watermark):
+                    state.watermark = row.embedded_at
+        finally:
+            state.refresh_lock.release()
@@ -1,7 +1,17 @@
-from twilio.rest import Client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from flask import current_app
-from app import db
-from app.models import SMSContext
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from app import db, clients
+from app.models import SMSContext, SMSDelivery, SMSSummary, SMSContinuation
+from app.services.ai_service import AIService
+from app.services.summary_service import SummaryService
+from app.utils import sms_text
+
+# Reply that asks for the next page of a long answer
+MORE_KEYWORD = 'more'
+MORE_SUFFIX = '\n(Reply MORE for the rest)'
 
 class SMSService:
     """Service for handling SMS functionality"""
@@ -15,25 +25,74 @@ class SMSService:
             return True
             
         try:
-            client = Client(
-                current_app.config['TWILIO_ACCOUNT_SID'],
-                current_app.config['TWILIO_AUTH_TOKEN']
-            )
-            message = client.messages.create(
-                body=message,
-                from_=current_app.config['TWILIO_PHONE_NUMBER'],
-                to=to_number
+            sid = cls._deliver(
+                clients.twilio(),
+                current_app.config['TWILIO_PHONE_NUMBER'],
+                to_number,
+                message
             )
-            current_app.logger.info(f"SMS sent to {to_number}: {message.sid}")
+            current_app.logger.info(f"SMS sent to {to_number}: {sid}")
             return True
         except Exception as e:
             current_app.logger.error(f"Error sending SMS: {str(e)}")
             return False
     
     @classmethod
-    def get_context(cls, phone_number):
-        """Get conversation context for a phone number"""
-        context = SMSContext.query.filter_by(phone_number=phone_number)\
+    def send_many(cls, messages, max_workers=None):
+        """Send a batch of SMS concurrently.
+        
+        Takes an iterable of (to_number, message) pairs and returns a list of
+        per-recipient results, in the same order, as dicts with 'to',
+        'success', 'sid' and 'error' keys.
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+        
+        if current_app.config['ENV'] != 'production':
+            results = []
+            for to_number, message in messages:
+                current_app.logger.info(f"[DEV] SMS would be sent to {to_number}: {message}")
+                results.append({'to': to_number, 'success': True, 'sid': None, 'error': None})
+            return results
+        
+        # Worker threads have no app context, so resolve shared state up front
+        client = clients.twilio()
+        from_number = current_app.config['TWILIO_PHONE_NUMBER']
+        
+        def send(item):
+            to_number, message = item
+            try:
+                sid = cls._deliver(client, from_number, to_number, message)
+                return {'to': to_number, 'success': True, 'sid': sid, 'error': None}
+            except Exception as e:
+                return {'to': to_number, 'success': False, 'sid': None, 'error': str(e)}
+        
+        max_workers = max_workers or current_app.config['SMS_SEND_CONCURRENCY']
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(messages))) as executor:
+            results = list(executor.map(send, messages))
+        
+        failed = sum(1 for result in results if not result['success'])
+        current_app.logger.info(f"Sent {len(results) - failed} of {len(results)} SMS ({failed} failed)")
+        return results
+    
+    @classmethod
+    def _deliver(cls, client, from_number, to_number, message):
+        """Send one message with the given client and return its SID"""
+        message = client.messages.create(
+            body=message,
+            from_=from_number,
+            to=to_number
+        )
+        return message.sid
+    
+    @classmethod
+    def get_context(cls, phone_number, before_id=None):
+        """Get conversation context for a phone number, optionally only rows older than before_id"""
+        query = SMSContext.query.filter_by(phone_number=phone_number)
+        if before_id is not None:
+            query = query.filter(SMSContext.id < before_id)
+        context = query\
             .order_by(SMSContext.timestamp.desc())\
             .limit(5)\
             .all()
@@ -56,18 +115,226 @@ class SMSService:
         )
         db.session.add(user_msg)
         db.session.add(bot_msg)
+        cls._trim_context(phone_number)
+        db.session.commit()
+    
+    @classmethod
+    def save_inbound(cls, phone_number, user_message):
+        """Save an inbound message before its reply has been generated"""
+        user_msg = SMSContext(
+            phone_number=phone_number,
+            role="user",
+            content=user_message
+        )
+        db.session.add(user_msg)
+        db.session.commit()
+        return user_msg
+    
+    @classmethod
+    def save_reply(cls, phone_number, bot_response):
+        """Save a reply to a previously saved inbound message"""
+        bot_msg = SMSContext(
+            phone_number=phone_number,
+            role="assistant",
+            content=bot_response
+        )
+        db.session.add(bot_msg)
+        cls._trim_context(phone_number)
+        db.session.commit()
+    
+    @classmethod
+    def generate_reply(cls, phone_number, user_message, inbound_id=None, categories=None):
+        """Generate and save the reply to a message, returning the first page to send.
         
-        # Keep only last 5 messages per phone number
-        old_messages = SMSContext.query.filter_by(phone_number=phone_number)\
-            .order_by(SMSContext.timestamp.desc())\
-            .offset(5)\
-            .all()
+        If the inbound message was already saved (inbound_id), only older rows
+        are used as context and just the reply is saved. categories are the
+        scanner results the webhook already has for the message, if any.
+        """
+        context = cls.get_context(phone_number, before_id=inbound_id)
+        summary, context = SummaryService.sms_context(phone_number, context, before_id=inbound_id)
+        response_text = sms_text.to_plain_text(
+            AIService.get_job_coaching_advice(user_message, context, summary, channel='sms', categories=categories)
+        )
+        if inbound_id is not None:
+            cls.save_reply(phone_number, response_text)
+        else:
+            cls.save_context(phone_number, user_message, response_text)
+        SummaryService.schedule_sms(phone_number)
+        return cls.paginate(phone_number, response_text)
+    
+    @classmethod
+    def paginate(cls, phone_number, text):
+        """Get the first page of a reply, keeping the rest until the user replies MORE"""
+        max_segments = current_app.config['SMS_PAGE_SEGMENTS']
+        if max_segments <= 0:
+            return text
+        
+        page, remainder = sms_text.split_page(text, max_segments, MORE_SUFFIX)
+        continuation = db.session.get(SMSContinuation, phone_number)
+        if not remainder and continuation is None:
+            return page
         
-        for msg in old_messages:
-            db.session.delete(msg)
+        try:
+            if not remainder:
+                db.session.delete(continuation)
+            elif continuation is None:
+                db.session.add(SMSContinuation(phone_number=phone_number, remainder=remainder))
+            else:
+                continuation.remainder = remainder
+                continuation.created_at = datetime.utcnow()
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent reply to the same number saved its own remainder
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+        return page
+    
+    @classmethod
+    def next_page(cls, phone_number):
+        """Get the next page of the last long reply, or None if there is nothing left to send"""
+        continuation = db.session.get(SMSContinuation, phone_number)
+        if continuation is None:
+            return None
         
+        ttl = timedelta(seconds=current_app.config['SMS_CONTINUATION_TTL'])
+        if continuation.created_at < datetime.utcnow() - ttl:
+            db.session.delete(continuation)
+            db.session.commit()
+            return None
+        return cls.paginate(phone_number, continuation.remainder)
+    
+    @classmethod
+    def clear_continuation(cls, phone_number):
+        """Drop the rest of the last long reply in the current transaction, so MORE can't send it later"""
+        SMSContinuation.query\
+            .filter_by(phone_number=phone_number)\
+            .delete(synchronize_session=False)
+    
+    @classmethod
+    def deliver_reply(cls, phone_number, user_message, inbound_id=None, categories=None):
+        """Generate a reply and send it via the REST API (runs in a background task)"""
+        try:
+            response_text = cls.generate_reply(phone_number, user_message, inbound_id, categories)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error generating SMS reply: {str(e)}")
+            response_text = "I apologize, but I'm having trouble processing your request. Please try again later."
+        
+        if not cls.send_sms(phone_number, response_text):
+            current_app.logger.error(f"Failed to deliver SMS reply to {phone_number}")
+    
+    @classmethod
+    def claim_message(cls, message_sid, phone_number):
+        """Record an inbound MessageSid.
+        
+        Returns None the first time a message is seen, or the existing
+        SMSDelivery when Twilio delivers the same message again.
+        """
+        try:
+            db.session.add(SMSDelivery(message_sid=message_sid, phone_number=phone_number))
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+            return db.session.get(SMSDelivery, message_sid)
+    
+    @classmethod
+    def release_message(cls, message_sid):
+        """Forget a MessageSid so a retried delivery is processed again"""
+        try:
+            db.session.rollback()
+            SMSDelivery.query.filter_by(message_sid=message_sid).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Failed to release message {message_sid}: {str(e)}")
+    
+    @classmethod
+    def record_response(cls, message_sid, response_text):
+        """Remember the reply returned for a message so a retry can reuse it"""
+        SMSDelivery.query\
+            .filter_by(message_sid=message_sid)\
+            .update({'response': response_text}, synchronize_session=False)
         db.session.commit()
     
+    @classmethod
+    def purge_deliveries(cls, batch_size=None):
+        """Delete delivery records older than the idempotency window, in chunks"""
+        batch_size = batch_size or current_app.config['CACHE_SWEEP_BATCH_SIZE']
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['SMS_IDEMPOTENCY_TTL'])
+        total = 0
+        while True:
+            expired = db.session.query(SMSDelivery.message_sid)\
+                .filter(SMSDelivery.created_at < cutoff)\
+                .limit(batch_size)\
+                .scalar_subquery()
+            try:
+                deleted = SMSDelivery.query\
+                    .filter(SMSDelivery.message_sid.in_(expired))\
+                    .delete(synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            total += deleted
+            if deleted < batch_size:
+                return total
+    
+    @classmethod
+    def _trim_context(cls, phone_number):
+        """Delete all but the newest messages for a phone number, in one statement"""
+        if not current_app.config['HISTORY_TRIM_ON_WRITE']:
+            return
+        db.session.flush()
+        newest = db.session.query(SMSContext.id)\
+            .filter_by(phone_number=phone_number)\
+            .order_by(SMSContext.timestamp.desc())
+        surplus = newest.offset(current_app.config['HISTORY_KEEP_MESSAGES']).scalar_subquery()
+        over_cap = newest.offset(current_app.config['HISTORY_MAX_MESSAGES']).scalar_subquery()
+        cls._trimmable(SMSContext.query.filter(SMSContext.id.in_(surplus)), over_cap)\
+            .delete(synchronize_session=False)
+    
+    @classmethod
+    def compact_context(cls):
+        """Trim stored context for every phone number at once"""
+        ranked = db.session.query(
+            SMSContext.id.label('id'),
+            func.row_number().over(
+                partition_by=SMSContext.phone_number,
+                order_by=SMSContext.timestamp.desc()
+            ).label('position')
+        ).subquery()
+        surplus = db.session.query(ranked.c.id)\
+            .filter(ranked.c.position > current_app.config['HISTORY_KEEP_MESSAGES'])\
+            .scalar_subquery()
+        over_cap = db.session.query(ranked.c.id)\
+            .filter(ranked.c.position > current_app.config['HISTORY_MAX_MESSAGES'])\
+            .scalar_subquery()
+        try:
+            deleted = cls._trimmable(SMSContext.query.filter(SMSContext.id.in_(surplus)), over_cap)\
+                .delete(synchronize_session=False)
+            db.session.commit()
+            return deleted
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @classmethod
+    def _trimmable(cls, query, over_cap):
+        """Limit a context query to rows already folded into their summary, when summaries are on.
+        
+        Rows in over_cap (past HISTORY_MAX_MESSAGES) can be trimmed either way,
+        so a number whose summary keeps failing still has its history bounded.
+        """
+        if not current_app.config['SUMMARY_ENABLED']:
+            return query
+        last_id = db.session.query(SMSSummary.last_context_id)\
+            .filter(SMSSummary.phone_number == SMSContext.phone_number)\
+            .scalar_subquery()
+        return query.filter(or_(SMSContext.id <= func.coalesce(last_id, 0), SMSContext.id.in_(over_cap)))
+    
     @classmethod
     def check_confirmation(cls, phone_number):
         """Check if user has a pending confirmation"""
@@ -89,4 +356,15 @@ class SMSService:
         )
         db.session.add(context)
         db.session.commit()
-        return context
\ No newline at end of file
+        return context
+    
+    @classmethod
+    def clear_pending(cls, context_id):
+        """Clear a pending confirmation once its message has been answered.
+        
+        Updates by id, as saving the reply may already have trimmed the row.
+        """
+        SMSContext.query\
+            .filter_by(id=context_id)\
+            .update({'awaiting_confirmation': False}, synchronize_session=False)
+        db.session.commit()
\ No newline at end of file
@@ -0,0 +1,163 @@
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db, tasks
+from app.models import Message, Conversation, SMSContext, SMSSummary
+from app.services.ai_service import AIService
+
+# Message.type -> chat completion role
+MESSAGE_ROLES = {
+    'user-message': 'user',
+    'bot-message': 'assistant'
+}
+
+class SummaryService:
+    """Service for rolling summaries of long chat conversations and SMS threads.
+    
+    Once SUMMARY_EVERY_MESSAGES new messages have been saved, the summary is
+    refreshed by a background task that folds them into the previous one.
+    Concurrent refreshes are resolved optimistically: only the first result
+    for a given starting point is stored.
+    
+    A summary stands in for the messages it covers, so it is sent with every
+    message newer than those, and at least SUMMARY_RECENT_MESSAGES.
+    """
+    
+    @classmethod
+    def conversation_context(cls, conversation_id, user_id, context):
+        """Get the summary of a chat conversation owned by user_id and the context to send with it"""
+        if not current_app.config['SUMMARY_ENABLED'] or not conversation_id:
+            return None, context
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None or conversation.user_id != user_id or not conversation.summary:
+            return None, context
+        uncovered = conversation.message_count - conversation.summary_message_count
+        return conversation.summary, cls._after_summary(context, uncovered)
+    
+    @classmethod
+    def schedule_conversation(cls, conversation_id):
+        """Refresh a conversation's summary in the background if enough messages are new"""
+        if not current_app.config['SUMMARY_ENABLED'] or not conversation_id:
+            return
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None:
+            return
+        if conversation.message_count - conversation.summary_message_count >= current_app.config['SUMMARY_EVERY_MESSAGES']:
+            tasks.submit(cls.update_conversation_summary, conversation_id)
+    
+    @classmethod
+    def update_conversation_summary(cls, conversation_id):
+        """Fold the messages not yet covered into a conversation's summary"""
+        conversation = db.session.get(Conversation, conversation_id)
+        if conversation is None:
+            return
+        covered = conversation.summary_message_count
+        messages = Message.query\
+            .filter_by(conversation_id=conversation_id)\
+            .order_by(Message.id)\
+            .offset(covered)\
+            .all()
+        if len(messages) < current_app.config['SUMMARY_EVERY_MESSAGES']:
+            return
+        
+        summary = AIService.summarize(conversation.summary, [
+            {'role': MESSAGE_ROLES.get(msg.type, 'user'), 'content': msg.content}
+            for msg in messages
+        ])
+        try:
+            Conversation.query\
+                .filter_by(id=conversation_id, summary_message_count=covered)\
+                .update({
+                    'summary': summary,
+                    'summary_message_count': covered + len(messages)
+                }, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @classmethod
+    def sms_context(cls, phone_number, context, before_id=None):
+        """Get the summary of an SMS thread and the context to send with it.
+        
+        context holds the latest messages older than before_id, if given.
+        """
+        if not current_app.config['SUMMARY_ENABLED']:
+            return None, context
+        summary = db.session.get(SMSSummary, phone_number)
+        if summary is None:
+            return None, context
+        uncovered = SMSContext.query\
+            .filter(SMSContext.phone_number == phone_number)\
+            .filter(SMSContext.id > summary.last_context_id)
+        if before_id is not None:
+            uncovered = uncovered.filter(SMSContext.id < before_id)
+        return summary.summary, cls._after_summary(context, uncovered.count())
+    
+    @classmethod
+    def schedule_sms(cls, phone_number):
+        """Refresh an SMS thread's summary in the background if enough messages are new"""
+        if not current_app.config['SUMMARY_ENABLED']:
+            return
+        pending = cls._unsummarized_sms(phone_number, cls._sms_last_id(phone_number)).count()
+        if pending >= current_app.config['SUMMARY_EVERY_MESSAGES']:
+            tasks.submit(cls.update_sms_summary, phone_number)
+    
+    @classmethod
+    def update_sms_summary(cls, phone_number):
+        """Fold the SMS messages not yet covered into the thread's summary"""
+        summary = db.session.get(SMSSummary, phone_number)
+        last_id = summary.last_context_id if summary else 0
+        rows = cls._unsummarized_sms(phone_number, last_id)\
+            .order_by(SMSContext.id)\
+            .all()
+        if len(rows) < current_app.config['SUMMARY_EVERY_MESSAGES']:
+            return
+        
+        text = AIService.summarize(summary.summary if summary else None, [
+            {'role': row.role, 'content': row.content} for row in rows
+        ])
+        try:
+            if summary is None:
+                db.session.add(SMSSummary(
+                    phone_number=phone_number,
+                    summary=text,
+                    last_context_id=rows[-1].id
+                ))
+            else:
+                SMSSummary.query\
+                    .filter_by(phone_number=phone_number, last_context_id=last_id)\
+                    .update({
+                        'summary': text,
+                        'last_context_id': rows[-1].id,
+                        'updated_at': datetime.utcnow()
+                    }, synchronize_session=False)
+            db.session.commit()
+        except IntegrityError:
+            # Another task created the first summary
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @classmethod
+    def _after_summary(cls, context, uncovered):
+        """Cut context to the messages a summary doesn't cover, keeping the latest few regardless"""
+        if not context:
+            return context
+        keep = max(current_app.config['SUMMARY_RECENT_MESSAGES'], uncovered)
+        return context[-keep:] if keep > 0 else []
+    
+    @classmethod
+    def _sms_last_id(cls, phone_number):
+        return db.session.query(SMSSummary.last_context_id)\
+            .filter_by(phone_number=phone_number)\
+            .scalar() or 0
+    
+    @classmethod
+    def _unsummarized_sms(cls, phone_number, last_id):
+        """Query the messages of an SMS thread newer than the summary"""
+        return SMSContext.query\
+            .filter(SMSContext.phone_number == phone_number)\
+            .filter(SMSContext.id > last_id)\
+            .filter(SMSContext.awaiting_confirmation.isnot(True))
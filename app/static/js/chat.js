@@ -60,6 +60,8 @@ export class Chat {
         
         if (message === '') return;
         
+        let loadingDiv = null;
+        let streamingDiv = null;
         try {
             if (!confirmed) {
                 // Show chat container first
@@ -75,14 +77,27 @@ export class Chat {
                 document.querySelector('.example-prompts').classList.add('hidden');
             }
             
-            // Show loading indicator
-            const loadingDiv = ui.showLoading();
+            // Show loading indicator until the first token arrives
+            loadingDiv = ui.showLoading();
+            let streamedText = '';
             console.log('Sending to server:', message);
-            const response = await this.sendToServer(message, confirmed);
+            const response = await this.streamFromServer(message, confirmed, (token) => {
+                if (loadingDiv) {
+                    loadingDiv.remove();
+                    loadingDiv = null;
+                }
+                streamedText += token;
+                if (streamingDiv) {
+                    ui.updateMessage(streamingDiv, streamedText);
+                } else {
+                    streamingDiv = ui.appendMessage(streamedText, 'bot-message', true);
+                }
+            });
             console.log('Server response:', response);
             
-            // Remove loading indicator
-            loadingDiv.remove();
+            // Remove loading indicator and the provisional streamed message
+            if (loadingDiv) loadingDiv.remove();
+            if (streamingDiv) streamingDiv.remove();
 
             if (response.requiresConfirmation && !confirmed) {
                 ui.showWarning(
@@ -112,11 +127,14 @@ export class Chat {
             // Save updated history
             this.saveHistory();
         } catch (error) {
+            // Drop the loading indicator and any partial reply from an interrupted stream
+            if (loadingDiv) loadingDiv.remove();
+            if (streamingDiv) streamingDiv.remove();
             ui.appendMessage(handleError(error), 'warning-message');
         }
     }
 
-    async sendToServer(message, confirmed) {
+    buildRequest(message, confirmed) {
         // Get context messages
         const context = this.history.getContextMessages(5).map(msg => ({
             role: msg.type === 'user-message' ? 'user' : 'assistant',
@@ -125,7 +143,7 @@ export class Chat {
         // Get CSRF token from meta tag
         const csrfToken = document.querySelector('meta[name="csrf-token"]').content;
         
-        const response = await fetch('/chat', {
+        return {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -139,18 +157,73 @@ export class Chat {
                 conversation_id: this.history.getConversationId()
             }),
             credentials: 'same-origin' // Required for CSRF
-        });
-        
+        };
+    }
+
+    checkResponse(response) {
         if (!response.ok) {
             if (response.status === 429) {
                 throw new Error('Rate limit exceeded. Please wait before sending more messages.');
             }
             throw new Error(`HTTP error! status: ${response.status}`);
         }
-        
+    }
+
+    async sendToServer(message, confirmed) {
+        const response = await fetch('/chat', this.buildRequest(message, confirmed));
+        this.checkResponse(response);
         return await response.json();
     }
 
+    async streamFromServer(message, confirmed, onToken) {
+        // Fall back to a single JSON response where streaming bodies are unsupported
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return this.sendToServer(message, confirmed);
+        }
+
+        const response = await fetch('/chat/stream', this.buildRequest(message, confirmed));
+        this.checkResponse(response);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // Server-Sent Events are separated by a blank line
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const raw of events) {
+                let event = 'message';
+                let data = '';
+                raw.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (!data) continue;
+
+                const payload = JSON.parse(data);
+                if (event === 'error') {
+                    throw new Error(payload.error.message);
+                } else if (event === 'done') {
+                    result = payload;
+                } else if (payload.token) {
+                    onToken(payload.token);
+                }
+            }
+        }
+
+        // A stream that closes without a done event was cut off before the reply was saved
+        if (!result) {
+            throw new Error('The response was interrupted. Please try again.');
+        }
+        return result;
+    }
+
     async clearChat() {
         try {
             // Clear Redis cache
@@ -181,6 +181,15 @@ export class UI {
         return messageDiv;
     }
 
+    updateMessage(messageDiv, message) {
+        // Re-render the text of a message that is still being streamed
+        const textContent = messageDiv.querySelector('.message-content > div:last-child');
+        if (textContent) {
+            textContent.innerHTML = window.marked.parse(message);
+        }
+        scrollToBottom(this.chatBox, false);
+    }
+
     highlightRelatedMessages(messageId) {
         // Remove previous highlights
         this.chatBox.querySelectorAll('.message.highlighted').forEach(msg => {
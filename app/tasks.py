@@ -0,0 +1,67 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+class _TaskQueueState:
+    """Executor and capacity for a single application in the current process"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.executor = None
+        self.slots = None
+
+class TaskQueue:
+    """Bounded pool of background threads for work done after a response.
+
+    Each worker process gets its own pool, created on first use so it is
+    never inherited across a fork. At most TASK_WORKERS tasks run at once
+    and at most TASK_QUEUE_SIZE are accepted (running plus waiting);
+    submit() returns False when the queue is full so callers can shed load
+    or fall back to doing the work inline.
+    """
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach a task pool to the application"""
+        app.extensions['tasks'] = _TaskQueueState()
+
+    def submit(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in an app context on a background thread"""
+        state = self._state()
+        if not state.slots.acquire(blocking=False):
+            return False
+
+        app = current_app._get_current_object()
+
+        def run():
+            try:
+                with app.app_context():
+                    func(*args, **kwargs)
+            except Exception as e:
+                app.logger.error(f"Background task {func.__name__} failed: {str(e)}")
+            finally:
+                state.slots.release()
+
+        try:
+            state.executor.submit(run)
+        except RuntimeError:
+            # Executor is shutting down
+            state.slots.release()
+            return False
+        return True
+
+    def _state(self):
+        state = current_app.extensions['tasks']
+        if state.pid != os.getpid():
+            with state.lock:
+                if state.pid != os.getpid():
+                    state.executor = ThreadPoolExecutor(
+                        max_workers=current_app.config['TASK_WORKERS'],
+                        thread_name_prefix='task'
+                    )
+                    state.slots = threading.BoundedSemaphore(current_app.config['TASK_QUEUE_SIZE'])
+                    state.pid = os.getpid()
+        return state
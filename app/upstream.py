@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app
+from app.exceptions import APIError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Seconds before the first retry, doubled for each one after
+RETRY_BACKOFF = 0.5
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    The circuit opens after `threshold` consecutive failures and rejects
+    calls for `reset_timeout` seconds. It then lets a single probe call
+    through (half-open): success closes the circuit, failure opens it again
+    for another `reset_timeout`.
+    """
+    def __init__(self, threshold, reset_timeout, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Check whether a call may go ahead, claiming the probe if one is due"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                # Only the first caller after the timeout probes; the rest keep failing fast
+                self._state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.threshold:
+                self._state = OPEN
+                self._opened_at = self.clock()
+
+    def release(self):
+        """Give up a claimed probe without an outcome, so the next caller can probe"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = OPEN
+
+class _UpstreamState:
+    """Breaker and concurrency slots for a single application in the current process"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.breaker = None
+        self.slots = None
+
+class UpstreamGuard:
+    """Protects workers from a slow or failing OpenAI API.
+
+    Each call is limited to OPENAI_DEADLINE seconds of wall-clock time across
+    all its attempts and backoff (the client's own retries are off, so this
+    guard does them), at most OPENAI_MAX_CONCURRENCY calls run at once per
+    worker process, and a circuit breaker rejects calls immediately after
+    OPENAI_BREAKER_THRESHOLD consecutive failures. Rejected calls raise APIError without touching the
+    network, so request threads are freed instead of queueing on a dead
+    upstream.
+    """
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Attach a breaker and call slots to the application"""
+        app.extensions['upstream'] = _UpstreamState()
+
+    @contextmanager
+    def guard(self, failures=(Exception,)):
+        """Run an OpenAI call under the guard, yielding a function that makes the attempts.
+
+        The yielded function takes func(timeout) and calls it with the time
+        left before the deadline, retrying exceptions in `failures` with
+        backoff while OPENAI_MAX_RETRIES and the deadline allow. Only those
+        exceptions count against the circuit; other errors (e.g. a bad
+        request) are our own and leave it alone.
+        """
+        config = current_app.config
+        state = self._state()
+
+        if not state.slots.acquire(timeout=config['OPENAI_QUEUE_TIMEOUT']):
+            current_app.logger.warning("OpenAI concurrency limit reached, rejecting call")
+            raise APIError("The AI service is busy. Please try again shortly.", code='UPSTREAM_BUSY')
+        try:
+            if not state.breaker.allow():
+                current_app.logger.warning("OpenAI circuit open, rejecting call")
+                raise APIError("The AI service is temporarily unavailable. Please try again later.", code='UPSTREAM_UNAVAILABLE')
+
+            deadline = time.monotonic() + config['OPENAI_DEADLINE']
+
+            def attempt(func):
+                for retry in range(config['OPENAI_MAX_RETRIES'] + 1):
+                    try:
+                        # Each attempt may run until the deadline, so a long reply isn't cut short
+                        return func(deadline - time.monotonic())
+                    except failures as e:
+                        delay = RETRY_BACKOFF * 2 ** retry
+                        if retry == config['OPENAI_MAX_RETRIES'] or time.monotonic() + delay >= deadline:
+                            raise
+                        current_app.logger.warning(f"OpenAI call failed, retrying in {delay}s: {str(e)}")
+                        time.sleep(delay)
+
+            outcome = None
+            try:
+                yield attempt
+                outcome = True
+            except failures:
+                outcome = False
+                raise
+            except Exception:
+                outcome = True
+                raise
+            finally:
+                if outcome is True:
+                    state.breaker.record_success()
+                elif outcome is False:
+                    state.breaker.record_failure()
+                    if state.breaker.state != CLOSED:
+                        current_app.logger.error("OpenAI circuit opened after repeated failures")
+                else:
+                    # Abandoned part way (e.g. a stream closed by the client)
+                    state.breaker.release()
+        finally:
+            state.slots.release()
+
+    def _state(self):
+        state = current_app.extensions['upstream']
+        if state.pid != os.getpid():
+            with state.lock:
+                if state.pid != os.getpid():
+                    state.breaker = CircuitBreaker(
+                        current_app.config['OPENAI_BREAKER_THRESHOLD'],
+                        current_app.config['OPENAI_BREAKER_RESET']
+                    )
+                    state.slots = threading.BoundedSemaphore(current_app.config['OPENAI_MAX_CONCURRENCY'])
+                    state.pid = os.getpid()
+        return state
@@ -0,0 +1,170 @@
+"""Content scanner for user messages.
+
+The sensitive-data patterns and the keyword lists are each compiled into one
+regex at import time, so a message is classified with two scans instead of
+one pass per check. They are kept apart so a match of one cannot hide the
+other (the "kill" in "kill@x.com" is both an email and a keyword). Keywords
+match whole words (plus common inflections), so "diet" does not match "die"
+and "skills" does not match "kill".
+"""
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+SENSITIVE = 'sensitive'
+HARMFUL = 'harmful'
+DISABILITY = 'disability'
+
+SENSITIVE_PATTERNS = {
+    'email': r'[\w\.-]+@[\w\.-]+',
+    'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
+    'credit_card': r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
+    'phone': r'\b\d{3}[-.\s]??\d{3}[-.\s]??\d{4}\b'
+}
+
+HARMFUL_KEYWORDS = [
+    "kill", "die", "dying", "suicide", "suicidal", "self harm",
+    "hurt myself", "hurt others", "violence", "violent", "abuse", "abusing",
+    "abusive", "murder", "attack"
+]
+
+DISABILITY_KEYWORDS = [
+    "disability", "disabilities", "disabled", "autism", "autistic", "adhd",
+    "cerebral palsy", "dyslexia", "dyslexic", "blind", "deaf", "wheelchair",
+    "mobility", "chronic illness", "mental health", "amputation", "amputee",
+    "paraplegia", "paraplegic", "quadriplegia", "quadriplegic", "neurodiverse",
+    "ptsd", "anxiety", "anxieties", "depression", "depressed", "depressive", "ocd",
+    "bipolar", "schizophrenia", "schizophrenic", "trauma", "traumatic",
+    "traumatized", "traumatised", "blindness", "deafness"
+]
+
+# Common phrases where a keyword is not a threat
+HARMFUL_EXCLUSIONS = {
+    'attack': ['heart', 'panic', 'anxiety', 'asthma']
+}
+
+# Keyword -> pattern for the words before it that make it harmless
+_EXCLUDED_BEFORE = {
+    keyword: re.compile(rf"\b(?:{'|'.join(map(re.escape, prefixes))})[\s-]+$", re.IGNORECASE)
+    for keyword, prefixes in HARMFUL_EXCLUSIONS.items()
+}
+
+# Inflections accepted after any keyword (kills, killed, killing, killer...)
+SUFFIXES = r'(?:s|es|d|ed|ing|er|ers)?'
+
+# Keywords ending in "e" also take -r and -rs (abuser, abusers)
+E_SUFFIXES = r'(?:s|es|d|ed|ing|er|ers|r|rs)?'
+
+def _keyword_pattern(keywords):
+    """
+    Builds a whole-word regex for a keyword list, factored into a prefix trie
+    so each word is matched in one walk rather than tried against every keyword.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        # "self harm", "self-harm" and "self  harm" are the same phrase
+        for char in re.sub(r'[\s-]+', ' ', keyword.lower()):
+            node = node.setdefault(char, {})
+        node[''] = ''
+
+    def build(node, last=''):
+        alternatives = [
+            (r'[\s-]+' if char == ' ' else re.escape(char)) + build(child, char)
+            for char, child in sorted(node.items()) if char
+        ]
+        if '' in node:
+            # End of a keyword
+            alternatives.append(E_SUFFIXES if last == 'e' else SUFFIXES)
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return f"(?:{'|'.join(alternatives)})"
+
+    return rf'\b{build(trie)}\b'
+
+# Matches only start at the beginning of a word, which skips most positions cheaply
+_SENSITIVE_SCANNER = re.compile(
+    r'(?<!\w)(?:' + '|'.join(
+        f'(?P<{name}>{pattern})' for name, pattern in SENSITIVE_PATTERNS.items()
+    ) + ')'
+)
+
+_KEYWORD_SCANNER = re.compile(
+    rf'(?<!\w)(?:(?P<{HARMFUL}>{_keyword_pattern(HARMFUL_KEYWORDS)})'
+    rf'|(?P<{DISABILITY}>{_keyword_pattern(DISABILITY_KEYWORDS)}))',
+    re.IGNORECASE
+)
+
+def _excluded(message, match):
+    """Check whether a harmful keyword match is part of a harmless phrase"""
+    text = match.group().lower()
+    for keyword, before in _EXCLUDED_BEFORE.items():
+        if text.startswith(keyword) and before.search(message, 0, match.start()):
+            return True
+    return False
+
+def classify(message):
+    """
+    Scans a message and returns the categories it falls into.
+    Maps each category to what matched first: the pattern type for
+    sensitive data, the matched text for keywords. Empty if nothing matched.
+    """
+    categories = {}
+    match = _SENSITIVE_SCANNER.search(message)
+    if match:
+        categories[SENSITIVE] = match.lastgroup
+
+    for match in _KEYWORD_SCANNER.finditer(message):
+        category = match.lastgroup
+        if category in categories:
+            continue
+        if category == HARMFUL and _excluded(message, match):
+            continue
+        categories[category] = match.group().lower()
+        if HARMFUL in categories and DISABILITY in categories:
+            break
+    return categories
+
+def _classify_chunk(chunk):
+    """Classify (key, text) pairs, keeping only those that matched"""
+    results = []
+    for key, text in chunk:
+        categories = classify(text)
+        if categories:
+            results.append((key, categories))
+    return results
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def classify_many(items, processes=None, chunk_size=1000):
+    """
+    Classifies an iterable of (key, text) pairs and yields (key, categories)
+    for each one that matched, in input order. Work is split into chunks and
+    spread over a pool of processes (one per CPU by default, 1 runs inline);
+    the input is consumed lazily, so it can stream from the database.
+    """
+    processes = processes or os.cpu_count() or 1
+    chunks = _chunks(items, chunk_size)
+    if processes == 1:
+        for chunk in chunks:
+            yield from _classify_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Keep every worker busy without reading the whole input ahead
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_classify_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
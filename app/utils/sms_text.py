@@ -0,0 +1,115 @@
+"""Plain-text formatting and segment accounting for SMS replies.
+
+A message that only uses the GSM-7 alphabet is sent 160 characters per
+segment (153 per part once it is split, with escaped characters such as
+"€" or "[" taking two). A single character outside it, such as a curly
+quote or an emoji, switches the whole message to UCS-2: 70 UTF-16 code
+units, or 67 per part. Carriers bill per segment, so replies are stripped
+of markdown, typographic punctuation is swapped for GSM-7 equivalents, and
+long replies are split into pages of a bounded number of segments.
+"""
+import re
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+# Characters sent as an escape sequence, counting as two
+GSM7_EXTENDED = frozenset("^{}\\[~]|€")
+
+# (single-segment limit, per-part limit) in septets or UTF-16 code units
+GSM7_LIMITS = (160, 153)
+UCS2_LIMITS = (70, 67)
+
+# Typographic characters models like to produce, and their GSM-7 stand-ins
+PUNCTUATION = str.maketrans({
+    '‘': "'", '’': "'", '‚': "'", '′': "'",
+    '“': '"', '”': '"', '„': '"', '″': '"',
+    '–': '-', '—': '-', '‑': '-', '−': '-',
+    '…': '...', '•': '-', '·': '-', '▪': '-',
+    '\u00a0': ' ', '\u2009': ' ', '\u202f': ' ', '\u200b': ''  # Non-breaking, thin and zero-width spaces
+})
+
+_MARKDOWN = [
+    (re.compile(r'```[^\n]*\n?|`'), ''),  # Code fences and inline code
+    (re.compile(r'^\s{0,3}#{1,6}\s+', re.MULTILINE), ''),  # Headers
+    (re.compile(r'^\s*>\s?', re.MULTILINE), ''),  # Block quotes
+    (re.compile(r'^\s*(?:[-*_]\s*){3,}$', re.MULTILINE), ''),  # Horizontal rules
+    (re.compile(r'^(\s*)[*+]\s+', re.MULTILINE), r'\1- '),  # Bullets
+    (re.compile(r'!?\[([^\]]*)\]\(([^)\s]+)\)'), r'\1 (\2)'),  # Links and images
+    (re.compile(r'(\*\*|__)(.+?)\1'), r'\2'),  # Bold
+    (re.compile(r'(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])'), r'\1'),  # Italic
+    (re.compile(r'(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)'), r'\1'),
+    (re.compile(r'~~(.+?)~~'), r'\1'),  # Strikethrough
+    (re.compile(r'[ \t]+$', re.MULTILINE), ''),
+    (re.compile(r'\n{3,}'), '\n\n')
+]
+
+def to_plain_text(text):
+    """Strip markdown and swap typographic punctuation for GSM-7 characters"""
+    text = text.translate(PUNCTUATION)
+    for pattern, replacement in _MARKDOWN:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+def is_gsm7(text):
+    """Check whether text can be sent in the GSM-7 alphabet"""
+    return all(char in GSM7_BASIC or char in GSM7_EXTENDED for char in text)
+
+def _units(char, gsm7):
+    if gsm7:
+        return 2 if char in GSM7_EXTENDED else 1
+    return 2 if ord(char) > 0xFFFF else 1  # Surrogate pair
+
+def segment_count(text):
+    """Count the segments a message is sent as"""
+    if not text:
+        return 0
+    gsm7 = is_gsm7(text)
+    single, part = GSM7_LIMITS if gsm7 else UCS2_LIMITS
+    units = [_units(char, gsm7) for char in text]
+    if sum(units) <= single:
+        return 1
+
+    # Escape sequences and surrogate pairs are never split across parts
+    segments, used = 1, 0
+    for size in units:
+        if used + size > part:
+            segments += 1
+            used = 0
+        used += size
+    return segments
+
+def _break_at(text, limit):
+    """Find the best place to end a page of at most limit characters"""
+    floor = limit // 2
+    for pattern in (r'\n', r'[.!?:;](?=\s)', r'\s'):
+        ends = [match.end() for match in re.finditer(pattern, text[:limit + 1]) if match.end() > floor]
+        if ends:
+            return ends[-1]
+    return limit
+
+def split_page(text, max_segments, suffix=''):
+    """Split off the first page of text, fitting in max_segments segments.
+
+    Returns the page and the rest of the text. If the text doesn't fit, the
+    page ends with suffix (e.g. a prompt to ask for more) and breaks at a
+    line, sentence or word boundary where possible. The rest is empty when
+    the whole text fits.
+    """
+    text = text.strip()
+    if segment_count(text) <= max_segments:
+        return text, ''
+
+    # Longest prefix that fits along with the suffix; the count only grows with length
+    low, high = 1, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if segment_count(text[:middle].rstrip() + suffix) <= max_segments:
+            low = middle
+        else:
+            high = middle - 1
+
+    cut = _break_at(text, low)
+    return text[:cut].rstrip() + suffix, text[cut:].strip()
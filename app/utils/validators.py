@@ -1,6 +1,8 @@
-import re
 import json
-from flask import current_app
+import logging
+import random
+from flask import current_app, g, has_request_context
+from app.utils import scanner
 
 class ValidationError(Exception):
     """Custom exception for validation errors"""
@@ -9,24 +11,28 @@ class ValidationError(Exception):
 class ValidationUtils:
     """Validation utilities for message content"""
     
+    @staticmethod
+    def classify(message):
+        """
+        Checks the message for sensitive, harmful and disability-related content in one pass.
+        Returns a dict mapping each detected category (see app.utils.scanner) to what matched.
+        """
+        categories = scanner.classify(message)
+        if scanner.SENSITIVE in categories:
+            current_app.logger.warning(f"Sensitive information detected: {categories[scanner.SENSITIVE]}")
+        if scanner.HARMFUL in categories:
+            current_app.logger.warning(f"Harmful content detected: {categories[scanner.HARMFUL]}")
+        if scanner.DISABILITY in categories:
+            current_app.logger.info(f"Disability-related content detected: {categories[scanner.DISABILITY]}")
+        return categories
+    
     @staticmethod
     def contains_sensitive_info(message):
         """
         Checks the message for patterns that indicate sensitive personal information.
         Returns True if sensitive data is detected, else False.
         """
-        patterns = {
-            'email': r'[\w\.-]+@[\w\.-]+',
-            'phone': r'\b\d{3}[-.\s]??\d{3}[-.\s]??\d{4}\b',
-            'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
-            'credit_card': r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b'
-        }
-        
-        for pattern_type, pattern in patterns.items():
-            if re.search(pattern, message):
-                current_app.logger.warning(f"Sensitive information detected: {pattern_type}")
-                return True
-        return False
+        return scanner.SENSITIVE in ValidationUtils.classify(message)
     
     @staticmethod
     def contains_harmful_interactions(message):
@@ -34,16 +40,7 @@ class ValidationUtils:
         Checks the message for language that might indicate harmful or dangerous content.
         Returns True if harmful content is detected, else False.
         """
-        harmful_keywords = [
-            "kill", "die", "suicide", "self harm", "self-harm",
-            "hurt myself", "hurt others", "violence", "abuse", "murder", "attack"
-        ]
-        lower_message = message.lower()
-        for keyword in harmful_keywords:
-            if keyword in lower_message:
-                current_app.logger.warning(f"Harmful content detected: {keyword}")
-                return True
-        return False
+        return scanner.HARMFUL in ValidationUtils.classify(message)
     
     @staticmethod
     def contains_disability_info(message):
@@ -52,26 +49,50 @@ class ValidationUtils:
         This is meant to prompt users to be cautious about sharing personal health or disability details.
         Returns True if disability-related content is detected, else False.
         """
-        disability_keywords = [
-            "disability", "disabled", "autism", "adhd", "cerebral palsy", 
-            "dyslexia", "blind", "deaf", "wheelchair", "mobility", 
-            "chronic illness", "mental health", "amputation", "paraplegia", 
-            "quadriplegia", "neurodiverse", "ptsd", "anxiety", "depression",
-            "ocd", "bipolar", "schizophrenia", "trauma"
-        ]
-        lower_message = message.lower()
-        for keyword in disability_keywords:
-            if keyword in lower_message:
-                current_app.logger.info(f"Disability-related content detected: {keyword}")
-                return True
-        return False
+        return scanner.DISABILITY in ValidationUtils.classify(message)
+    
+    @staticmethod
+    def _payload(data):
+        """Serialize a request/response for logging, truncating long strings"""
+        limit = current_app.config['LOG_PAYLOAD_MAX_CHARS']
+        
+        def truncate(value):
+            if isinstance(value, str) and len(value) > limit:
+                return f"{value[:limit]}... ({len(value)} chars)"
+            if isinstance(value, dict):
+                return {key: truncate(item) for key, item in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [truncate(item) for item in value]
+            return value
+        
+        return json.dumps(truncate(data), default=str)
+    
+    @staticmethod
+    def _sampled():
+        """Decide whether to log this request's payloads.
+        
+        The decision is made once per request, so a logged request always
+        comes with its response.
+        """
+        if not current_app.logger.isEnabledFor(logging.INFO):
+            return False
+        rate = current_app.config['LOG_PAYLOAD_SAMPLE_RATE']
+        if rate >= 1:
+            return True
+        if not has_request_context():
+            return random.random() < rate
+        if 'log_payloads' not in g:
+            g.log_payloads = random.random() < rate
+        return g.log_payloads
     
     @staticmethod
     def log_request(request_data):
         """Log request data"""
-        current_app.logger.info(f"Request: {json.dumps(request_data, default=str)}")
+        if ValidationUtils._sampled():
+            current_app.logger.info(f"Request: {ValidationUtils._payload(request_data)}")
     
     @staticmethod
     def log_response(response_data):
         """Log response data"""
-        current_app.logger.info(f"Response: {json.dumps(response_data, default=str)}")
\ No newline at end of file
+        if ValidationUtils._sampled():
+            current_app.logger.info(f"Response: {ValidationUtils._payload(response_data)}")
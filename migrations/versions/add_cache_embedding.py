@@ -0,0 +1,23 @@
+"""add question embedding to cache rows for the semantic cache tier
+
+Revision ID: add_cache_embedding
+Revises: add_conversation_summaries
+Create Date: 2026-10-18 17:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_cache_embedding'
+down_revision = 'add_conversation_summaries'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('cache',
+        sa.Column('embedding', sa.LargeBinary(), nullable=True)
+    )
+
+def downgrade():
+    op.drop_column('cache', 'embedding')
@@ -0,0 +1,27 @@
+"""add index on cache expires
+
+Revision ID: add_cache_expires_index
+Revises: add_user_id_to_message
+Create Date: 2026-10-18 10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_cache_expires_index'
+down_revision = 'add_user_id_to_message'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Index used by the expiry sweeper and oldest-first eviction
+    op.create_index(
+        op.f('ix_cache_expires'),
+        'cache', ['expires'],
+        unique=False,
+        if_not_exists=True
+    )
+
+def downgrade():
+    op.drop_index(op.f('ix_cache_expires'), table_name='cache')
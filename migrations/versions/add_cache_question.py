@@ -0,0 +1,34 @@
+"""add question text and embedding time to cache rows for the semantic cache tier
+
+Revision ID: add_cache_question
+Revises: add_sms_continuation
+Create Date: 2026-10-18 21:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_cache_question'
+down_revision = 'add_sms_continuation'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('cache',
+        sa.Column('question', sa.Text(), nullable=True)
+    )
+    op.add_column('cache',
+        sa.Column('embedded_at', sa.DateTime(), nullable=True)
+    )
+    # Index used to load vectors stored by other workers since the last refresh
+    op.create_index(
+        op.f('ix_cache_embedded_at'),
+        'cache', ['embedded_at'],
+        unique=False
+    )
+
+def downgrade():
+    op.drop_index(op.f('ix_cache_embedded_at'), table_name='cache')
+    op.drop_column('cache', 'embedded_at')
+    op.drop_column('cache', 'question')
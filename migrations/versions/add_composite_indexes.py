@@ -0,0 +1,84 @@
+"""add composite indexes for history, context and confirmation lookups
+
+Revision ID: add_composite_indexes
+Revises: add_conversation_table
+Create Date: 2026-10-18 14:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_composite_indexes'
+down_revision = 'add_conversation_table'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Build without locking writes on Postgres; CONCURRENTLY can't run in a transaction
+    with op.get_context().autocommit_block():
+        # Newest-first history per user and per conversation
+        op.create_index(
+            'ix_message_user_id_timestamp',
+            'message', ['user_id', 'timestamp'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_message_conversation_id_timestamp',
+            'message', ['conversation_id', 'timestamp'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+
+        # Newest-first SMS context per phone number
+        op.create_index(
+            'ix_sms_context_phone_number_timestamp',
+            'sms_context', ['phone_number', 'timestamp'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+
+        # Pending confirmations only, checked on every inbound SMS
+        op.create_index(
+            'ix_sms_context_pending',
+            'sms_context', ['phone_number'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('awaiting_confirmation'),
+            sqlite_where=sa.text('awaiting_confirmation = 1')
+        )
+
+        # Covered by ix_message_conversation_id_timestamp
+        op.drop_index(
+            op.f('ix_message_conversation_id'),
+            table_name='message',
+            if_exists=True,
+            postgresql_concurrently=True
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_message_conversation_id'),
+            'message', ['conversation_id'],
+            unique=False,
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+        for index_name, table_name in [
+            ('ix_sms_context_pending', 'sms_context'),
+            ('ix_sms_context_phone_number_timestamp', 'sms_context'),
+            ('ix_message_conversation_id_timestamp', 'message'),
+            ('ix_message_user_id_timestamp', 'message')
+        ]:
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                if_exists=True,
+                postgresql_concurrently=True
+            )
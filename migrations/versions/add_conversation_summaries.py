@@ -0,0 +1,36 @@
+"""add rolling summaries for chat conversations and SMS threads
+
+Revision ID: add_conversation_summaries
+Revises: add_composite_indexes
+Create Date: 2026-10-18 16:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_conversation_summaries'
+down_revision = 'add_composite_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('conversation',
+        sa.Column('summary', sa.Text(), nullable=True)
+    )
+    op.add_column('conversation',
+        sa.Column('summary_message_count', sa.Integer(), nullable=False, server_default='0')
+    )
+    
+    op.create_table('sms_summary',
+        sa.Column('phone_number', sa.String(length=20), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('last_context_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('phone_number')
+    )
+
+def downgrade():
+    op.drop_table('sms_summary')
+    op.drop_column('conversation', 'summary_message_count')
+    op.drop_column('conversation', 'summary')
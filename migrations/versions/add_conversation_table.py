@@ -0,0 +1,62 @@
+"""add conversation summary table and backfill it from messages
+
+Revision ID: add_conversation_table
+Revises: add_sms_delivery
+Create Date: 2026-10-18 12:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_conversation_table'
+down_revision = 'add_sms_delivery'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('conversation',
+        sa.Column('id', sa.String(length=50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('last_message', sa.String(length=60), nullable=False),
+        sa.Column('last_updated', sa.DateTime(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    
+    # Index used to list a user's conversations newest first
+    op.create_index(
+        'ix_conversation_user_id_last_updated',
+        'conversation', ['user_id', 'last_updated'],
+        unique=False
+    )
+    
+    # Backfill one summary per existing conversation from its latest message
+    op.execute("""
+        INSERT INTO conversation (id, user_id, last_message, last_updated, message_count)
+        SELECT
+            conversation_id,
+            user_id,
+            CASE WHEN length(content) > 50 THEN substr(content, 1, 50) || '...' ELSE content END,
+            timestamp,
+            message_count
+        FROM (
+            SELECT
+                conversation_id,
+                user_id,
+                content,
+                timestamp,
+                row_number() OVER (
+                    PARTITION BY conversation_id ORDER BY timestamp DESC, id DESC
+                ) AS position,
+                count(*) OVER (PARTITION BY conversation_id) AS message_count
+            FROM message
+            WHERE conversation_id IS NOT NULL
+        ) ranked
+        WHERE position = 1
+    """)
+
+def downgrade():
+    op.drop_index('ix_conversation_user_id_last_updated', table_name='conversation')
+    op.drop_table('conversation')
@@ -0,0 +1,26 @@
+"""add sms_continuation table for paged SMS replies
+
+Revision ID: add_sms_continuation
+Revises: add_cache_embedding
+Create Date: 2026-10-18 19:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_sms_continuation'
+down_revision = 'add_cache_embedding'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('sms_continuation',
+        sa.Column('phone_number', sa.String(length=20), nullable=False),
+        sa.Column('remainder', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('phone_number')
+    )
+
+def downgrade():
+    op.drop_table('sms_continuation')
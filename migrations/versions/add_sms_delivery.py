@@ -0,0 +1,36 @@
+"""add sms_delivery table for webhook idempotency
+
+Revision ID: add_sms_delivery
+Revises: add_cache_expires_index
+Create Date: 2026-10-18 11:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_sms_delivery'
+down_revision = 'add_cache_expires_index'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # One row per processed Twilio MessageSid
+    op.create_table('sms_delivery',
+        sa.Column('message_sid', sa.String(length=64), nullable=False),
+        sa.Column('phone_number', sa.String(length=20), nullable=False),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('message_sid')
+    )
+    
+    # Index used by the TTL cleanup
+    op.create_index(
+        op.f('ix_sms_delivery_created_at'),
+        'sms_delivery', ['created_at'],
+        unique=False
+    )
+
+def downgrade():
+    op.drop_index(op.f('ix_sms_delivery_created_at'), table_name='sms_delivery')
+    op.drop_table('sms_delivery')
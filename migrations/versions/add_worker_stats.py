@@ -0,0 +1,28 @@
+"""add worker_stats table for cache counters published by each worker
+
+Revision ID: add_worker_stats
+Revises: add_cache_question
+Create Date: 2026-10-18 23:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic
+revision = 'add_worker_stats'
+down_revision = 'add_cache_question'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('worker_stats',
+        sa.Column('worker', sa.String(length=100), nullable=False),
+        sa.Column('stats', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('worker')
+    )
+    op.create_index(op.f('ix_worker_stats_updated_at'), 'worker_stats', ['updated_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_worker_stats_updated_at'), table_name='worker_stats')
+    op.drop_table('worker_stats')
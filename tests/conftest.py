@@ -0,0 +1,13 @@
+import pytest
+from app import create_app, db
+from app.config.config import TestingConfig
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # create_app writes its log files under the working directory
+    monkeypatch.chdir(tmp_path)
+    app = create_app(TestingConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
@@ -0,0 +1,177 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Cache, WorkerStats
+from app.services import cache_service
+from app.services.ai_service import AIService
+from app.services.cache_service import LRUCache, SingleFlight, CONTEXT_KEY_PREFIX
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_service.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_lru_get_returns_stored_value():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set('a', 'answer')
+    assert cache.get('a') == 'answer'
+    assert cache.stats()['hits'] == 1
+
+def test_lru_miss_is_counted():
+    cache = LRUCache(max_size=2, ttl=60)
+    assert cache.get('missing') is None
+    assert cache.stats()['misses'] == 1
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+def test_lru_entries_expire(clock):
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=5)
+    clock[0] += 10
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    clock[0] += 60
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+def test_lru_zero_size_disables_storage():
+    cache = LRUCache(max_size=0, ttl=60)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+def test_single_flight_runs_concurrent_calls_once():
+    flights = SingleFlight()
+    calls = []
+    results = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'answer'
+
+    def call():
+        results.append(flights.do('key', compute))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=call) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    # Hold the leader until every follower has joined its call
+    deadline = time.monotonic() + 5
+    while flights.coalesced < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['answer'] * 5
+    assert flights.coalesced == 4
+
+def test_single_flight_shares_errors_and_forgets_key():
+    flights = SingleFlight()
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        flights.do('key', fail)
+    assert flights.do('key', lambda: 'recovered') == 'recovered'
+
+def test_context_cache_misses_when_earlier_history_differs(app):
+    app.config['CACHE_CONTEXT_ENABLED'] = True
+    calls = []
+
+    @AIService.cache_response
+    def advise(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        calls.append(context)
+        return f"reply {len(calls)}"
+
+    recent = [
+        {'role': 'user', 'content': 'Any other tips?'},
+        {'role': 'assistant', 'content': 'Sure, happy to help.'}
+    ]
+    first = [{'role': 'user', 'content': 'I am deaf and work in retail'}] + recent
+    second = [{'role': 'user', 'content': 'I use a wheelchair'}] + recent
+
+    assert advise(AIService, 'What should I do next?', first) == 'reply 1'
+    assert advise(AIService, 'What should I do next?', first) == 'reply 1'
+    assert advise(AIService, 'What should I do next?', second) == 'reply 2'
+    assert AIService.context_cache_key('What next?', first) != AIService.context_cache_key('What next?', second)
+
+def test_cli_sweep_caps_each_tier_separately(app):
+    app.config.update(CACHE_MAX_ROWS=2, CACHE_CONTEXT_MAX_ROWS=1)
+    now = datetime.utcnow()
+    # Context rows have a shorter TTL, so they expire before older response rows
+    for i in range(3):
+        db.session.add(Cache(id=f'response:{i}', response='r', expires=now + timedelta(minutes=50 + i)))
+    for i in range(2):
+        db.session.add(Cache(id=f'{CONTEXT_KEY_PREFIX}{i}', response='r', expires=now + timedelta(minutes=10 + i)))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['cache', 'sweep'])
+    assert 'Removed 0 expired and 2 evicted cache rows' in result.output
+    assert sorted(row.id for row in Cache.query) == ['response:1', 'response:2', f'{CONTEXT_KEY_PREFIX}1']
+
+def test_row_cap_never_evicts_leases(app):
+    app.config.update(CACHE_MAX_ROWS=1)
+    now = datetime.utcnow()
+    db.session.add(Cache(id='lease:response:a', response='', expires=now + timedelta(seconds=30)))
+    db.session.add(Cache(id='response:a', response='r', expires=now + timedelta(minutes=50)))
+    db.session.add(Cache(id='response:b', response='r', expires=now + timedelta(minutes=51)))
+    db.session.commit()
+
+    assert cache_service.CacheService.enforce_max_rows() == 1
+    assert sorted(row.id for row in Cache.query) == ['lease:response:a', 'response:b']
+
+def test_cli_stats_adds_up_counters_published_by_workers(app):
+    cache_service.CacheService.get('response:missing')
+    cache_service.CacheService.publish_stats()
+    db.session.add(WorkerStats(worker='other:1', stats=json.dumps({'response': {'hits': 2, 'misses': 3}, 'coalesced': 1})))
+    db.session.add(WorkerStats(worker='gone:2', stats=json.dumps({'response': {'hits': 50}}), updated_at=datetime.utcnow() - timedelta(hours=1)))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['cache', 'stats'])
+    stats = json.loads(result.output)
+    assert len(stats['workers']) == 2 and 'gone:2' not in stats['workers']
+    assert stats['total']['response']['hits'] == 2
+    assert stats['total']['response']['misses'] == 4
+    assert stats['total']['coalesced'] == 1
+
+def test_cache_miss_reads_the_cache_once(app, monkeypatch):
+    reads = []
+    get = cache_service.CacheService.get.__func__
+
+    def counting_get(cls, key, tier='response'):
+        reads.append(key)
+        return get(cls, key, tier)
+
+    monkeypatch.setattr(cache_service.CacheService, 'get', classmethod(counting_get))
+
+    @AIService.cache_response
+    def advise(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        return 'answer'
+
+    assert advise(AIService, 'How do I write a cover letter?') == 'answer'
+    assert len(reads) == 1
+    assert advise(AIService, 'How do I write a cover letter?') == 'answer'
+    assert len(reads) == 2
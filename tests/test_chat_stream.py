@@ -0,0 +1,68 @@
+import json
+from app.exceptions import APIError
+from app.models import Message
+from app.services.ai_service import AIService
+
+def parse(chunks):
+    """Split Server-Sent Events into (event, data) pairs"""
+    events = []
+    for block in ''.join(chunks).strip().split('\n\n'):
+        lines = block.split('\n')
+        event = lines[0][len('event: '):] if lines[0].startswith('event: ') else 'message'
+        events.append((event, json.loads(lines[-1][len('data: '):])))
+    return events
+
+def post(app, message):
+    return app.test_client().post('/chat/stream', json={'message': message}, buffered=False)
+
+def test_stream_frames_tokens_then_done_and_saves_after_closing(app):
+    response = post(app, 'how do I write a cover letter')
+    assert response.mimetype == 'text/event-stream'
+
+    chunks = []
+    for chunk in response.response:
+        chunks.append(chunk.decode())
+        if len(chunks) == 1:
+            # Nothing is saved while tokens are still being sent
+            assert Message.query.count() == 0
+    response.close()
+
+    events = parse(chunks)
+    assert [event for event, _ in events[:-1]] == ['message'] * (len(events) - 1)
+    assert events[-1][0] == 'done'
+    done = events[-1][1]
+    assert done['response'] == ''.join(data['token'] for _, data in events[:-1])
+    assert done['response'] == "Development mode response: You said 'how do I write a cover letter'"
+
+    rows = Message.query.order_by(Message.id).all()
+    assert [(row.type, row.content) for row in rows] == [
+        ('user-message', 'how do I write a cover letter'),
+        ('bot-message', done['response'])
+    ]
+    assert {row.conversation_id for row in rows} == {done['conversation_id']}
+
+def test_stream_failure_sends_error_event_and_saves_nothing(app, monkeypatch):
+    def fail(cls, *args, **kwargs):
+        yield 'Partial'
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(AIService, 'stream_job_coaching_advice', classmethod(fail))
+    events = parse([post(app, 'how do I write a cover letter').get_data(as_text=True)])
+    assert events[0] == ('message', {'token': 'Partial'})
+    assert events[1][0] == 'error' and len(events) == 2
+    assert events[1][1]['error']['code'] == 'API_ERROR'
+    assert events[1][1]['error']['request_id']
+    assert Message.query.count() == 0
+
+def test_stream_passes_on_upstream_rejections(app, monkeypatch):
+    def reject(cls, *args, **kwargs):
+        raise APIError("The AI service is busy. Please try again shortly.", code='UPSTREAM_BUSY')
+        yield
+
+    monkeypatch.setattr(AIService, 'stream_job_coaching_advice', classmethod(reject))
+    events = parse([post(app, 'how do I write a cover letter').get_data(as_text=True)])
+    assert events == [('error', {'error': {
+        'code': 'UPSTREAM_BUSY',
+        'message': "The AI service is busy. Please try again shortly.",
+        'request_id': events[0][1]['error']['request_id']
+    }})]
@@ -0,0 +1,15 @@
+import os
+from app import clients
+
+def test_clients_are_shared_within_a_worker(app):
+    app.config.update(TWILIO_ACCOUNT_SID='AC123', TWILIO_AUTH_TOKEN='token')
+    assert clients.openai() is clients.openai()
+    assert clients.twilio() is clients.twilio()
+
+def test_forked_worker_builds_its_own_clients(app, monkeypatch):
+    parent = clients.openai()
+    pid = os.getpid()
+    monkeypatch.setattr(os, 'getpid', lambda: pid + 1)
+    child = clients.openai()
+    assert child is not parent
+    assert clients.openai() is child
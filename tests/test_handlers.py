@@ -0,0 +1,68 @@
+import pytest
+import sentry_sdk
+from flask import Flask, abort
+from app import configure_sentry
+from app.exceptions import APIError, ValidationError
+
+@pytest.fixture
+def reported(app, monkeypatch):
+    """Exceptions sent to Sentry one by one"""
+    captured = []
+    monkeypatch.setattr(sentry_sdk, 'capture_exception', captured.append)
+
+    def rate_limited():
+        abort(429)
+
+    def invalid():
+        raise ValidationError("Message cannot be empty")
+
+    def failed():
+        raise APIError("Failed to get AI response")
+
+    app.add_url_rule('/test/rate-limited', view_func=rate_limited)
+    app.add_url_rule('/test/invalid', view_func=invalid)
+    app.add_url_rule('/test/failed', view_func=failed)
+    return captured
+
+def test_expected_errors_are_counted_not_reported(app, reported):
+    client = app.test_client()
+    assert client.get('/no-such-page').status_code == 404
+    assert client.get('/test/rate-limited').status_code == 429
+    assert client.get('/test/invalid').status_code == 400
+    assert client.get('/test/invalid').status_code == 400
+
+    assert reported == []
+    assert app.extensions['error_counts'].drain() == {
+        'NOT_FOUND': 1,
+        'RATE_LIMIT_EXCEEDED': 1,
+        'VALIDATION_ERROR': 2
+    }
+
+def test_unexpected_errors_are_reported(app, reported):
+    assert app.test_client().get('/test/failed').status_code == 503
+    assert [type(error) for error in reported] == [APIError]
+    assert app.extensions['error_counts'].drain() == {}
+
+def test_traces_sampler_uses_longest_matching_prefix(monkeypatch):
+    options = {}
+    monkeypatch.setattr(sentry_sdk, 'init', lambda **kwargs: options.update(kwargs))
+    app = Flask(__name__)
+    app.config.update(
+        ENV='production',
+        SENTRY_DSN=None,
+        SENTRY_TRACES_SAMPLE_RATE=0.1,
+        SENTRY_PROFILES_SAMPLE_RATE=0.1,
+        SENTRY_ROUTE_SAMPLE_RATES={'/chat': 0.5, '/chat/stream': 0.05, '/health': 0.0}
+    )
+    configure_sentry(app)
+    sampler = options['traces_sampler']
+
+    def rate(path, parent_sampled=None):
+        return sampler({'parent_sampled': parent_sampled, 'wsgi_environ': {'PATH_INFO': path}})
+
+    assert rate('/chat/stream') == 0.05
+    assert rate('/chat') == 0.5
+    assert rate('/chat/history') == 0.5
+    assert rate('/health') == 0.0
+    assert rate('/sms') == 0.1
+    assert rate('/chat', parent_sampled=True) is True
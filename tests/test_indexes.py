@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.services.message_service import MessageService
+from app.services.sms_service import SMSService
+
+def query_plan(call):
+    """Run call and return the SQLite query plan of each SELECT it issued"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    connection = db.session.connection()
+    return [
+        ' '.join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+        for statement, parameters in statements
+    ]
+
+def test_check_confirmation_uses_pending_index(app):
+    plans = query_plan(lambda: SMSService.check_confirmation('+15555550100'))
+    assert plans and all('USING INDEX ix_sms_context_pending' in plan for plan in plans)
+
+def test_get_context_uses_phone_number_index(app):
+    plans = query_plan(lambda: SMSService.get_context('+15555550100'))
+    assert plans == ['SEARCH sms_context USING INDEX ix_sms_context_phone_number_timestamp (phone_number=?)']
+
+def test_user_history_uses_user_index(app):
+    plans = query_plan(lambda: MessageService.get_message_history(user_id=1))
+    assert plans == ['SEARCH message USING INDEX ix_message_user_id_timestamp (user_id=?)']
+
+def test_conversation_history_uses_conversation_index(app):
+    plans = query_plan(lambda: MessageService.get_message_history(conversation_id='abc'))
+    assert plans == ['SEARCH message USING INDEX ix_message_conversation_id_timestamp (conversation_id=?)']
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Conversation, Message
+from app.services.message_service import MessageService
+
+def exchange(content):
+    now = datetime.utcnow()
+    return (
+        {'content': content, 'type': 'user-message', 'timestamp': now},
+        {'content': f"reply to {content}", 'type': 'bot-message', 'timestamp': now}
+    )
+
+def test_concurrent_first_messages_share_the_conversation(app, monkeypatch):
+    MessageService.record_exchange(*exchange('first'), conversation_id='c1')
+
+    # The second request looked the conversation up before the first one committed
+    get = db.session.get
+    missed = []
+
+    def stale_get(model, ident, **kwargs):
+        if model is Conversation and not missed:
+            missed.append(ident)
+            return None
+        return get(model, ident, **kwargs)
+
+    monkeypatch.setattr(db.session, 'get', stale_get)
+    assert MessageService.record_exchange(*exchange('second'), conversation_id='c1')
+
+    assert missed == ['c1']
+    assert Message.query.filter_by(conversation_id='c1').count() == 4
+    assert db.session.get(Conversation, 'c1').message_count == 4
+
+def test_record_exchange_adds_both_messages_in_one_commit(app, monkeypatch):
+    commits = []
+    commit = db.session.commit
+    monkeypatch.setattr(db.session, 'commit', lambda: commits.append(1) or commit())
+
+    assert MessageService.record_exchange(*exchange('first'), conversation_id='c1')
+    assert len(commits) == 1
+    rows = Message.query.order_by(Message.id).all()
+    assert [(row.type, row.content) for row in rows] == [
+        ('user-message', 'first'),
+        ('bot-message', 'reply to first')
+    ]
+    assert db.session.get(Conversation, 'c1').message_count == 2
+
+def test_trim_history_keeps_only_the_newest_messages(app):
+    app.config['HISTORY_KEEP_MESSAGES'] = 3
+    start = datetime.utcnow()
+    MessageService.cache_message({'content': 'other user', 'type': 'user-message', 'timestamp': start}, user_id=7)
+    MessageService.cache_message({'content': 'in a conversation', 'type': 'user-message', 'timestamp': start}, conversation_id='c1')
+    for i in range(5):
+        MessageService.cache_message({'content': f"message {i}", 'type': 'user-message', 'timestamp': start + timedelta(seconds=i)})
+
+    anonymous = Message.query.filter_by(user_id=None, conversation_id=None).order_by(Message.timestamp)
+    assert [row.content for row in anonymous] == ['message 2', 'message 3', 'message 4']
+    assert Message.query.filter_by(user_id=7).count() == 1
+    assert Message.query.filter_by(conversation_id='c1').count() == 1
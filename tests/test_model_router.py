@@ -0,0 +1,48 @@
+import pytest
+from app.services.model_router import ModelRouter, LIGHT, FULL
+from app.utils import scanner
+
+def history(turns):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': 'hello'} for i in range(turns)]
+
+@pytest.mark.parametrize('message', ['Thanks!', 'ok', 'Yes.', 'got it', 'sounds good'])
+def test_trivial_turns_use_light_tier(app, message):
+    assert ModelRouter.classify(message, history(2)) == LIGHT
+
+@pytest.mark.parametrize('message', [
+    'Can you help?',
+    'resume tips',
+    'I have autism',
+    'I have been applying to warehouse jobs for three months and have not heard back from any of them',
+])
+def test_substantive_turns_use_full_tier(app, message):
+    assert ModelRouter.classify(message) == FULL
+
+def test_short_follow_up_deep_in_conversation_uses_full_tier(app):
+    assert ModelRouter.classify('the second one', history(2)) == LIGHT
+    assert ModelRouter.classify('the second one', history(6)) == FULL
+    assert ModelRouter.classify('the second one', history(2), summary='Wants remote work') == FULL
+    assert ModelRouter.classify('thanks', history(20)) == LIGHT
+
+def test_route_applies_channel_overrides(app):
+    app.config['OPENAI_MODEL_TIERS'] = {
+        LIGHT: {'model': 'small', 'max_tokens': 300},
+        FULL: {'model': 'large', 'max_tokens': 1000}
+    }
+    app.config['OPENAI_CHANNEL_OVERRIDES'] = {'sms': {FULL: {'max_tokens': 200}}}
+    assert ModelRouter.route('thanks') == (LIGHT, 'small', 300)
+    assert ModelRouter.route('resume tips') == (FULL, 'large', 1000)
+    assert ModelRouter.route('resume tips', channel='sms') == (FULL, 'large', 200)
+
+def test_routing_can_be_disabled(app):
+    app.config['MODEL_ROUTING_ENABLED'] = False
+    assert ModelRouter.classify('thanks') == FULL
+
+def test_classify_uses_categories_the_caller_already_scanned(app, monkeypatch):
+    def rescan(message):
+        raise AssertionError('message scanned again')
+
+    monkeypatch.setattr(scanner, 'classify', rescan)
+    assert ModelRouter.classify('i feel depressed', categories={scanner.DISABILITY: 'depressed'}) == FULL
+    assert ModelRouter.classify('the second one', categories={}) == LIGHT
+    assert ModelRouter.route('the second one', channel='sms', categories={}).tier == LIGHT
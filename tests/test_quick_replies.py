@@ -0,0 +1,56 @@
+import json
+import os
+import pytest
+from app import db
+from app.models import SMSContinuation, SMSDelivery
+from app.services.quick_reply_service import QuickReplyService
+from app.services.sms_service import SMSService
+
+PHONE = '+15555550100'
+
+def write_intents(path, intents, mtime):
+    path.write_text(json.dumps({'intents': intents}))
+    os.utime(path, (mtime, mtime))
+
+def test_bundled_intents_match_whole_messages(app):
+    assert QuickReplyService.reply_for(PHONE, 'Thanks!!') is not None
+    assert QuickReplyService.reply_for(PHONE, 'hi there') is not None
+    assert QuickReplyService.reply_for(PHONE, 'thanks, but how do I ask for an accommodation') is None
+
+def test_acknowledgement_after_question_goes_to_model(app):
+    SMSService.save_context(PHONE, 'resume tips', 'Would you like help with your summary?')
+    assert QuickReplyService.reply_for(PHONE, 'ok') is None
+    assert QuickReplyService.reply_for(PHONE, 'hello') is not None
+
+def test_intents_reload_when_file_changes(app, tmp_path):
+    path = tmp_path / 'quick_replies.json'
+    write_intents(path, [{'name': 'thanks', 'phrases': ['thanks'], 'reply': 'Welcome'}], 1000)
+    app.config['QUICK_REPLIES_FILE'] = str(path)
+    app.config['QUICK_REPLIES_RELOAD_INTERVAL'] = 0
+    assert QuickReplyService.reply_for(PHONE, 'thanks') == 'Welcome'
+
+    write_intents(path, [{'name': 'thanks', 'phrases': ['thanks'], 'reply': 'Any time'}], 2000)
+    assert QuickReplyService.reply_for(PHONE, 'thanks') == 'Any time'
+
+    # A broken edit keeps the last good table
+    path.write_text('{')
+    os.utime(path, (3000, 3000))
+    assert QuickReplyService.reply_for(PHONE, 'thanks') == 'Any time'
+
+def test_quick_reply_drops_pending_continuation(app):
+    db.session.add(SMSContinuation(phone_number=PHONE, remainder='The rest of an old reply'))
+    db.session.commit()
+    client = app.test_client()
+    client.post('/sms', data={'From': PHONE, 'Body': 'Thanks', 'MessageSid': 'SM1'})
+    response = client.post('/sms', data={'From': PHONE, 'Body': 'more', 'MessageSid': 'SM2'})
+    assert b'The rest of an old reply' not in response.data
+    assert db.session.get(SMSContinuation, PHONE) is None
+
+def test_quick_reply_save_failure_releases_message(app, monkeypatch):
+    def fail(*args):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(SMSService, 'save_context', fail)
+    response = app.test_client().post('/sms', data={'From': PHONE, 'Body': 'Thanks', 'MessageSid': 'SM1'})
+    assert response.status_code == 500
+    assert db.session.get(SMSDelivery, 'SM1') is None
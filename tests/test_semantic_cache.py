@@ -0,0 +1,177 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Cache
+from app.services import semantic_cache
+from app.services.ai_service import AIService
+from app.services.cache_service import CacheService
+from app.services.semantic_cache import contradicts, embed, SemanticCache, VectorIndex, REFRESH_OVERLAP
+
+np = semantic_cache.np
+requires_numpy = pytest.mark.skipif(np is None, reason='numpy is not installed')
+
+@pytest.fixture
+def app(app):
+    app.config.update(SEMANTIC_CACHE_ENABLED=True, SEMANTIC_CACHE_DIMENSIONS=1024)
+    return app
+
+@pytest.fixture
+def advise():
+    calls = []
+
+    @AIService.cache_response
+    def advise(cls, user_message, context=None, summary=None, channel='chat', categories=None):
+        calls.append(user_message)
+        return f"reply to {user_message}"
+
+    advise.calls = calls
+    return advise
+
+@pytest.mark.parametrize('question, other', [
+    ("Is it legal to ask about my disability in an interview?",
+     "Is it illegal to ask about my disability in an interview?"),
+    ("Should I tell my employer about my disability?",
+     "Should I not tell my employer about my disability?"),
+    ("Do I have to disclose my diagnosis?", "I don't have to disclose my diagnosis?"),
+    ("Is my employer allowed to ask for medical records?",
+     "Is my employer forbidden to ask for medical records?"),
+    ("Is that a fair reason to fire me?", "Is that an unfair reason to fire me?"),
+])
+def test_contradicts_negations_and_antonyms(question, other):
+    assert contradicts(question, other)
+    assert contradicts(other, question)
+
+def test_contradicts_allows_rephrasings():
+    assert not contradicts("How do I ask my boss for accommodations?", "how can I ask my boss for an accommodation")
+    assert not contradicts("What should I wear to an interview", "what to wear to an interview?")
+
+def test_semantic_tier_is_skipped_without_numpy(app, advise, monkeypatch):
+    monkeypatch.setattr(semantic_cache, 'np', None)
+    assert not SemanticCache.enabled()
+    assert advise(AIService, "How do I ask my boss for accommodations?") == "reply to How do I ask my boss for accommodations?"
+    assert advise(AIService, "How do I ask my boss for accommodations?") == "reply to How do I ask my boss for accommodations?"
+    assert len(advise.calls) == 1
+    assert Cache.query.one().embedding is None
+
+@requires_numpy
+def test_embed_returns_unit_vectors():
+    vector = embed("How do I ask my boss for accommodations?", 256)
+    assert vector.shape == (256,)
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+
+@requires_numpy
+def test_embed_scores_rephrasings_above_unrelated_questions():
+    question = embed("How do I ask my boss for accommodations", 1024)
+    rephrased = embed("how can I ask my boss for an accommodation?", 1024)
+    unrelated = embed("What should I wear to an interview", 1024)
+    assert question @ rephrased > 0.85
+    assert question @ unrelated < 0.3
+
+@requires_numpy
+def test_index_returns_most_similar_key():
+    index = VectorIndex(1024, max_entries=10)
+    index.add('boss', embed("ask my boss for accommodations", 1024))
+    index.add('interview', embed("what to wear to an interview", 1024))
+    key, score = index.search(embed("asking my boss for accommodations", 1024))
+    assert key == 'boss' and score > 0.5
+
+@requires_numpy
+def test_index_remove_and_eviction():
+    index = VectorIndex(16, max_entries=4)
+    assert index.search(embed("anything", 16)) == (None, 0.0)
+    for i in range(6):
+        assert index.add(f'k{i}', embed(f"question number {i}", 16), f"question number {i}")
+    assert not index.add('k5', embed("question number 5", 16))
+    assert len(index) <= 4 and index.payload('k5') == "question number 5"
+    assert index.payload('k0') is None
+    index.remove('k5')
+    assert 'k5' not in index._rows and index.payload('k5') is None
+
+@requires_numpy
+def test_wrapper_reuses_answer_for_rephrased_question(app, advise):
+    first = advise(AIService, "How do I ask my boss for accommodations?")
+    assert advise(AIService, "how can I ask my boss for an accommodation") == first
+    assert len(advise.calls) == 1
+
+    row = Cache.query.one()
+    assert row.question == "How do I ask my boss for accommodations?"
+    assert row.embedded_at is not None
+    assert np.frombuffer(row.embedding, dtype=np.float32).shape == (1024,)
+    assert SemanticCache.stats()['hits'] == 1
+
+@requires_numpy
+def test_wrapper_never_reuses_answer_for_negated_question(app, advise):
+    advise(AIService, "Is it legal to ask about my disability in an interview?")
+    assert advise(AIService, "Is it illegal to ask about my disability in an interview?") == \
+        "reply to Is it illegal to ask about my disability in an interview?"
+    advise(AIService, "Should I tell my employer about my disability?")
+    assert advise(AIService, "Should I not tell my employer about my disability?") == \
+        "reply to Should I not tell my employer about my disability?"
+    assert len(advise.calls) == 4
+
+@requires_numpy
+def test_refresh_loads_late_writes_from_other_workers(app):
+    app.config['SEMANTIC_CACHE_REFRESH_INTERVAL'] = 0
+    now = datetime.utcnow()
+
+    def store(key, question, embedded_at):
+        db.session.add(Cache(
+            id=key,
+            response=f"answer to {question}",
+            expires=now + timedelta(hours=1),
+            embedding=SemanticCache.embed(question).tobytes(),
+            question=question,
+            embedded_at=embedded_at
+        ))
+        db.session.commit()
+
+    store('response:new', "What should I wear to an interview", now)
+    assert SemanticCache.lookup(SemanticCache.embed("what to wear to an interview"), "what to wear to an interview") == \
+        "answer to What should I wear to an interview"
+
+    # Stored by another worker before the newest row but committed after it was loaded,
+    # or at exactly the same time
+    store('response:late', "How do I ask my boss for accommodations", now - REFRESH_OVERLAP / 2)
+    store('response:same', "Can I work part time while on disability benefits", now)
+    assert SemanticCache.lookup(SemanticCache.embed("how can I ask my boss for an accommodation"), "how can I ask my boss for an accommodation") == \
+        "answer to How do I ask my boss for accommodations"
+    assert SemanticCache.lookup(SemanticCache.embed("can I work part time on disability benefits"), "can I work part time on disability benefits") == \
+        "answer to Can I work part time while on disability benefits"
+
+@requires_numpy
+def test_cli_stats_shows_the_workers_similarity_histogram(app, advise):
+    advise(AIService, "How do I ask my boss for accommodations?")
+    advise(AIService, "how can I ask my boss for an accommodation")
+    CacheService.publish_stats()
+
+    result = app.test_cli_runner().invoke(args=['cache', 'stats'])
+    semantic = json.loads(result.output)['total']['semantic']
+    assert semantic['hits'] == 1 and semantic['misses'] == 1
+    assert sum(semantic['similarity_histogram'].values()) == 2
+
+def stream(app, message):
+    """Post a message to the streaming endpoint in a new session and parse its events"""
+    # A new session each time, so the conversation never grows a summary
+    response = app.test_client().post('/chat/stream', json={'message': message, 'confirmed': True})
+    events = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        lines = block.split('\n')
+        event = lines[0][len('event: '):] if lines[0].startswith('event: ') else 'message'
+        events.append((event, json.loads(lines[-1][len('data: '):])))
+    return events
+
+@requires_numpy
+def test_stream_serves_cached_and_similar_questions_as_one_token(app):
+    first = stream(app, "How do I ask my boss for accommodations?")
+    reply = first[-1][1]['response']
+    assert len(first) > 2 and first[-1][0] == 'done'
+
+    for message in ["How do I ask my boss for accommodations?", "how can I ask my boss for an accommodation"]:
+        events = stream(app, message)
+        assert events == [('message', {'token': reply}), ('done', events[-1][1])]
+        assert events[-1][1]['response'] == reply
+    assert SemanticCache.stats()['hits'] == 1
+
+    negated = stream(app, "How do I not ask my boss for accommodations?")
+    assert negated[-1][1]['response'] != reply
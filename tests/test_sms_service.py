@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import SMSContext
+from app.services.sms_service import SMSService
+
+PHONE = '+15555550122'
+OTHER_PHONE = '+15555550133'
+
+def test_trim_context_keeps_only_the_newest_messages(app):
+    app.config.update(HISTORY_KEEP_MESSAGES=3, SUMMARY_ENABLED=False)
+    start = datetime.utcnow() - timedelta(minutes=1)
+    for i in range(4):
+        db.session.add(SMSContext(phone_number=PHONE, role='user', content=f"message {i}", timestamp=start + timedelta(seconds=i)))
+    db.session.add(SMSContext(phone_number=OTHER_PHONE, role='user', content='other message', timestamp=start))
+    db.session.commit()
+
+    SMSService.save_context(PHONE, 'question', 'answer')
+    kept = SMSContext.query.filter_by(phone_number=PHONE).order_by(SMSContext.id)
+    assert [row.content for row in kept] == ['message 3', 'question', 'answer']
+    assert SMSContext.query.filter_by(phone_number=OTHER_PHONE).count() == 1
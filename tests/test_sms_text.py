@@ -0,0 +1,49 @@
+import pytest
+from app.utils.sms_text import to_plain_text, is_gsm7, segment_count, split_page
+
+def test_to_plain_text_strips_markdown():
+    text = "## Tips\n\n**Be early** and *prepared*.\n\n* Bring your [resume](https://example.com)\n* Ask `questions`"
+    assert to_plain_text(text) == (
+        "Tips\n\nBe early and prepared.\n\n"
+        "- Bring your resume (https://example.com)\n- Ask questions"
+    )
+
+def test_to_plain_text_keeps_reply_in_gsm7():
+    text = to_plain_text("You’re doing great — keep going…")
+    assert text == "You're doing great - keep going..."
+    assert is_gsm7(text)
+
+@pytest.mark.parametrize('text, segments', [
+    ('', 0),
+    ('a' * 160, 1),
+    ('a' * 161, 2),
+    ('a' * 306, 2),
+    ('a' * 307, 3),
+    ('€' * 80, 1),  # Escaped characters count twice
+    ('€' * 81, 2),
+    ('é' * 160, 1),  # In the GSM-7 alphabet
+    ('ê' * 70, 1),  # Not in it, so the message is UCS-2
+    ('ê' * 71, 2),
+    ('a' * 150 + '’', 3),
+    ('😀' * 35, 1),  # Surrogate pairs count twice
+    ('😀' * 36, 2),
+])
+def test_segment_count(text, segments):
+    assert segment_count(text) == segments
+
+def test_split_page_returns_short_text_whole():
+    assert split_page('Short reply.', 2, ' MORE') == ('Short reply.', '')
+
+def test_split_page_breaks_at_sentence_within_limit():
+    sentences = ' '.join(f"Sentence number {i} is here." for i in range(40))
+    page, rest = split_page(sentences, 2, '\n(Reply MORE)')
+    assert segment_count(page) <= 2
+    assert page.endswith('here.\n(Reply MORE)')
+    assert rest.startswith('Sentence number')
+
+    pages = [page]
+    while rest:
+        page, rest = split_page(rest, 2, '\n(Reply MORE)')
+        assert segment_count(page) <= 2
+        pages.append(page)
+    assert ' '.join(page.replace('\n(Reply MORE)', '') for page in pages) == sentences
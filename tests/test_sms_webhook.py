@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db, tasks
+from app.models import SMSContext, SMSDelivery
+from app.services.sms_service import SMSService
+
+PHONE = '+15555550111'
+MESSAGE = 'how do i talk about my disability at work'
+
+@pytest.fixture
+def app(app):
+    app.config.update(SMS_ASYNC_ENABLED=False)
+    return app
+
+def post(client, body, sid):
+    return client.post('/sms', data={'From': PHONE, 'Body': body, 'MessageSid': sid})
+
+def test_failed_confirmed_reply_can_be_confirmed_again(app, monkeypatch):
+    client = app.test_client()
+    assert b'Reply "y"' in post(client, MESSAGE, 'SM1').data
+
+    generate_reply = SMSService.generate_reply
+    monkeypatch.setattr(SMSService, 'generate_reply', lambda *args: 1 / 0)
+    assert post(client, 'y', 'SM2').status_code == 503
+    assert SMSService.check_confirmation(PHONE).original_message == MESSAGE
+
+    monkeypatch.setattr(SMSService, 'generate_reply', generate_reply)
+    response = post(client, 'y', 'SM3')
+    assert response.status_code == 200
+    assert MESSAGE.encode() in response.data
+    assert SMSService.check_confirmation(PHONE) is None
+
+def test_async_reply_returns_empty_response_once_queued(app, monkeypatch):
+    app.config['SMS_ASYNC_ENABLED'] = True
+    queued = []
+    monkeypatch.setattr(tasks, 'submit', lambda func, *args: queued.append((func, args)) or True)
+
+    response = post(app.test_client(), 'how do i write a cover letter', 'SM1')
+    assert response.status_code == 200
+    assert b'<Message>' not in response.data and b'<Response' in response.data
+    assert queued[0][0] == SMSService.deliver_reply
+    assert queued[0][1][:2] == (PHONE, 'how do i write a cover letter')
+    assert [msg['role'] for msg in SMSService.get_context(PHONE)] == ['user']
+
+def test_async_reply_is_generated_inline_when_queue_is_full(app, monkeypatch):
+    app.config['SMS_ASYNC_ENABLED'] = True
+    monkeypatch.setattr(tasks, 'submit', lambda func, *args: False)
+
+    response = post(app.test_client(), 'how do i write a cover letter', 'SM1')
+    assert response.status_code == 200
+    assert b"<Message>Development mode response: You said 'how do i write a cover letter'" in response.data
+    assert [msg['role'] for msg in SMSService.get_context(PHONE)] == ['user', 'assistant']
+
+def test_duplicate_message_sid_replays_the_first_reply(app):
+    client = app.test_client()
+    first = post(client, 'how do i write a cover letter', 'SM1')
+    second = post(client, 'how do i write a cover letter', 'SM1')
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data
+    assert [row.role for row in SMSContext.query.order_by(SMSContext.id)] == ['user', 'assistant']
+
+def test_purge_deliveries_keeps_messages_inside_the_ttl(app):
+    app.config['SMS_IDEMPOTENCY_TTL'] = 3600
+    now = datetime.utcnow()
+    for sid, age in [('SM1', 7200), ('SM2', 3700), ('SM3', 3500), ('SM4', 0)]:
+        db.session.add(SMSDelivery(message_sid=sid, phone_number=PHONE, created_at=now - timedelta(seconds=age)))
+    db.session.commit()
+
+    assert SMSService.purge_deliveries(batch_size=1) == 2
+    assert [row.message_sid for row in SMSDelivery.query.order_by(SMSDelivery.message_sid)] == ['SM3', 'SM4']
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Conversation, SMSContext, SMSSummary
+from app.services.sms_service import SMSService
+from app.services.summary_service import SummaryService
+
+PHONE = '+15555550123'
+
+@pytest.fixture
+def app(app):
+    app.config.update(SUMMARY_ENABLED=True, SUMMARY_RECENT_MESSAGES=2)
+    return app
+
+def history(count):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f"message {i}"} for i in range(count)]
+
+def test_conversation_context_keeps_messages_the_summary_does_not_cover(app):
+    db.session.add(Conversation(id='c1', message_count=10, summary='Wants remote work', summary_message_count=4))
+    db.session.commit()
+
+    summary, context = SummaryService.conversation_context('c1', None, history(10))
+    assert summary == 'Wants remote work'
+    assert context == history(10)[4:]
+
+    Conversation.query.filter_by(id='c1').update({'summary_message_count': 10})
+    assert SummaryService.conversation_context('c1', None, history(10))[1] == history(10)[-2:]
+    assert SummaryService.conversation_context('c1', 7, history(10)) == (None, history(10))
+
+def test_sms_context_keeps_messages_newer_than_the_summary(app):
+    start = datetime.utcnow()
+    for i in range(5):
+        db.session.add(SMSContext(id=i + 1, phone_number=PHONE, role='user', content=f"message {i}", timestamp=start + timedelta(seconds=i)))
+    db.session.add(SMSSummary(phone_number=PHONE, summary='Wants remote work', last_context_id=1))
+    db.session.commit()
+
+    context = SMSService.get_context(PHONE, before_id=5)
+    summary, trimmed = SummaryService.sms_context(PHONE, context, before_id=5)
+    assert summary == 'Wants remote work'
+    assert [msg['content'] for msg in trimmed] == ['message 1', 'message 2', 'message 3']
+
+def test_trim_caps_history_when_summaries_keep_failing(app):
+    app.config.update(HISTORY_KEEP_MESSAGES=2, HISTORY_MAX_MESSAGES=4)
+    start = datetime.utcnow()
+    for i in range(6):
+        db.session.add(SMSContext(phone_number=PHONE, role='user', content=f"message {i}", timestamp=start + timedelta(seconds=i)))
+    db.session.commit()
+
+    assert SMSService.compact_context() == 2
+    assert [row.content for row in SMSContext.query.order_by(SMSContext.id)] == [f"message {i}" for i in range(2, 6)]
@@ -0,0 +1,126 @@
+import time
+import pytest
+from app import upstream
+from app.upstream import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_breaker(threshold=3, reset_timeout=30):
+    clock = FakeClock()
+    return CircuitBreaker(threshold, reset_timeout, clock=clock), clock
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker, _ = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+def test_breaker_lets_one_probe_through_after_reset_timeout():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 29
+    assert not breaker.allow()
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # Probe already in flight
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+def test_breaker_reopens_when_probe_fails():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 59
+    assert not breaker.allow()
+    clock.now = 60
+    assert breaker.allow()
+
+def test_breaker_released_probe_can_be_retried():
+    breaker, clock = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 30
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    app.config.update(OPENAI_DEADLINE=45, OPENAI_MAX_RETRIES=2, OPENAI_BREAKER_THRESHOLD=2)
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'monotonic', clock)
+    monkeypatch.setattr(time, 'sleep', lambda seconds: setattr(clock, 'now', clock.now + seconds))
+    return clock
+
+def call(clock, outcomes, failures=(ConnectionError,)):
+    """Run a guarded call whose attempts take 10s each and fail with the given errors in turn"""
+    timeouts = []
+
+    def attempt(timeout):
+        timeouts.append(timeout)
+        clock.now += 10
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with upstream.guard(failures) as run:
+        return run(attempt), timeouts
+
+def test_guard_retries_within_the_deadline(clock):
+    result, timeouts = call(clock, [ConnectionError(), ConnectionError(), 'reply'])
+    assert result == 'reply'
+    # Each attempt gets all the time left; the backoff sleeps count against it
+    assert timeouts == [45, 34.5, 23.5]
+    assert clock.now == 31.5
+
+def test_guard_stops_retrying_at_the_deadline(clock):
+    timeouts = []
+
+    def time_out(timeout):
+        timeouts.append(timeout)
+        clock.now += timeout
+        raise ConnectionError('timed out')
+
+    with pytest.raises(ConnectionError):
+        with upstream.guard((ConnectionError,)) as run:
+            run(time_out)
+    assert timeouts == [45]
+    assert clock.now == 45
+
+def test_guard_counts_one_failure_per_call_and_skips_other_errors(clock):
+    with pytest.raises(ConnectionError):
+        call(clock, [ConnectionError()] * 3)
+    assert upstream._state().breaker.state == CLOSED
+
+    with pytest.raises(ValueError):
+        call(clock, [ValueError(), 'reply'])
+    assert upstream._state().breaker.state == CLOSED
+
+    with pytest.raises(ConnectionError):
+        call(clock, [ConnectionError()] * 3)
+    with pytest.raises(ConnectionError):
+        call(clock, [ConnectionError()] * 3)
+    assert upstream._state().breaker.state == OPEN
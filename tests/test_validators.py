@@ -1,5 +1,6 @@
 import pytest
 from flask import Flask
+from app.utils import scanner
 from app.utils.validators import ValidationUtils
 
 @pytest.fixture(autouse=True)
@@ -25,3 +26,90 @@ def test_contains_disability_info_positive():
 
 def test_contains_disability_info_negative():
     assert not ValidationUtils.contains_disability_info("Just looking for advice")
+
+def test_contains_harmful_interactions_matches_inflections():
+    assert ValidationUtils.contains_harmful_interactions("He said he was dying")
+    assert ValidationUtils.contains_harmful_interactions("They attacked me at work")
+    assert ValidationUtils.contains_harmful_interactions("Thinking about self-harm")
+
+def test_contains_harmful_interactions_ignores_substrings():
+    assert not ValidationUtils.contains_harmful_interactions("I'm on a diet and studying")
+    assert not ValidationUtils.contains_harmful_interactions("How do I list my skills?")
+
+def test_contains_harmful_interactions_ignores_medical_attacks():
+    assert not ValidationUtils.contains_harmful_interactions("I had a heart attack last year")
+    assert not ValidationUtils.contains_harmful_interactions("I get panic attacks in interviews")
+
+@pytest.mark.parametrize('message', [
+    "I was traumatized at work",
+    "my blindness",
+    "deafness runs in my family",
+    "I am schizophrenic",
+    "I feel depressed",
+])
+def test_contains_disability_info_matches_derived_forms(message):
+    assert ValidationUtils.contains_disability_info(message)
+
+def test_contains_harmful_interactions_ignores_medical_attacks_with_extra_spacing():
+    assert not ValidationUtils.contains_harmful_interactions("I had a heart  attack last year")
+    assert not ValidationUtils.contains_harmful_interactions("after my panic-attack")
+    assert ValidationUtils.contains_harmful_interactions("a heart attack, then they attacked me")
+
+def test_classify_reports_keywords_inside_sensitive_matches():
+    assert scanner.classify("kill@x.com") == {'sensitive': 'email', 'harmful': 'kill'}
+
+def substring_check(keywords, message):
+    """The check the scanner replaced"""
+    return any(keyword in message.lower() for keyword in keywords)
+
+@pytest.mark.parametrize('category, keywords', [
+    (scanner.HARMFUL, scanner.HARMFUL_KEYWORDS),
+    (scanner.DISABILITY, scanner.DISABILITY_KEYWORDS)
+])
+def test_classify_flags_inflections_the_substring_check_flagged(category, keywords):
+    for keyword in keywords:
+        suffixes = ['', 's', 'es', 'd', 'ed', 'ing', 'er', 'ers']
+        if keyword.endswith('e'):
+            suffixes += ['r', 'rs']
+        for suffix in suffixes:
+            message = f"I think my boss is an {keyword}{suffix}"
+            assert substring_check(keywords, message)
+            assert category in scanner.classify(message), message
+
+def test_contains_harmful_interactions_matches_abusers():
+    assert ValidationUtils.contains_harmful_interactions("my boss is an abuser")
+    assert ValidationUtils.contains_harmful_interactions("Abusers at work")
+
+def test_contains_disability_info_is_case_insensitive():
+    assert ValidationUtils.contains_disability_info("I was diagnosed with ADHD")
+    assert not ValidationUtils.contains_disability_info("I blindly applied everywhere")
+
+def test_classify_returns_all_categories():
+    categories = ValidationUtils.classify("I'm deaf, my SSN is 123-45-6789 and I want to kill")
+    assert categories == {'sensitive': 'ssn', 'harmful': 'kill', 'disability': 'deaf'}
+
+def test_classify_returns_empty_for_clean_message():
+    assert ValidationUtils.classify("Can you review my resume?") == {}
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_classify_many_yields_flagged_items_in_order(processes):
+    items = [(i, "Just looking for advice") for i in range(50)]
+    items[3] = (3, "I have autism")
+    items[40] = (40, "Email me at user@example.com")
+    results = list(scanner.classify_many(items, processes=processes, chunk_size=8))
+    assert results == [(3, {'disability': 'autism'}), (40, {'sensitive': 'email'})]
+
+def test_payload_logging_is_sampled_once_per_request(monkeypatch):
+    app = Flask(__name__)
+    app.config.update(LOG_PAYLOAD_SAMPLE_RATE=0.5, LOG_PAYLOAD_MAX_CHARS=500)
+    app.logger.setLevel('INFO')
+    draws = iter([0.1, 0.9, 0.9, 0.1])
+    monkeypatch.setattr('app.utils.validators.random.random', lambda: next(draws))
+    logged = []
+    monkeypatch.setattr(app.logger, 'info', logged.append)
+
+    for _ in range(2):
+        with app.test_request_context():
+            ValidationUtils.log_request({'message': 'hi'})
+            ValidationUtils.log_response({'response': 'hello'})
+    assert logged == ['Request: {"message": "hi"}', 'Response: {"response": "hello"}']